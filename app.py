@@ -1,40 +1,33 @@
 import streamlit as st
-from src.rag_pipeline import answer_question
-from src.utils import wrap_letters
+import requests
+from src import api_client
+from src.history import HISTORY_PAGE_SIZE, ChatHistory, prune_sessions
+from src.utils import wrap_letters, static_url, load_static_bytes
 import streamlit.components.v1 as components
-import os
+import time
+import uuid
+
+# Cliente fino: ni embeddings, ni ES, ni Ollama en este proceso; los modelos
+# y su estado los da el servidor
+if not api_client.RAG_API_URL:
+    from src.model_pool import get_model_pool
+    from src.rag_pipeline import DEFAULT_BUDGET_S, answer_with_budget, compare_models
 
 
-# Make Streamlit serve /static directory
 st.markdown("""
     <style>
     .block-container { padding-top: 2rem; }
     </style>
 """, unsafe_allow_html=True)
 
-# Serve static folder manually
-static_path = os.path.join(os.getcwd(), "static")
-st.markdown(f"""
-    <script>
-        window._static_dir = "{static_path}";
-    </script>
-""", unsafe_allow_html=True)
-
 st.set_page_config(page_title="WW2 RAG Chat", page_icon="🪖", layout="wide")
 
-# ---------- LOAD LOCAL FONT AS BASE64 ----------
-import base64
-
-font_path = "static/fonts/fraktur_regular.ttf"
-
-with open(font_path, "rb") as f:
-    fraktur_base64 = base64.b64encode(f.read()).decode()
-
+# ---------- LOCAL FONT (served from /app/static, cached by the browser) ----------
 font_css = f"""
 <style>
 @font-face {{
     font-family: "FrakturWW2";
-    src: url("data:font/ttf;base64,{fraktur_base64}") format("truetype");
+    src: url("{static_url('fonts/fraktur_regular.ttf')}") format("truetype");
     font-weight: normal;
     font-style: normal;
 }}
@@ -44,9 +37,13 @@ font_css = f"""
 st.markdown(font_css, unsafe_allow_html=True)
 
 # Load CSS
-def local_css(file_name):
+@st.cache_resource
+def read_css(file_name):
     with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        return f.read()
+
+def local_css(file_name):
+    st.markdown(f"<style>{read_css(file_name)}</style>", unsafe_allow_html=True)
 
 local_css("app.css")
 
@@ -61,16 +58,15 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 
-with open("static/helmet_base64.txt") as f:
-    b64 = f.read()
-
+# The GLB is fetched once by the browser from /app/static instead of being
+# inlined as base64 into every rerun's payload.
 components.html(f"""
 <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
                 
                 
 
 
-<model-viewer src="data:model/gltf-binary;base64,{b64}"
+<model-viewer src="{static_url('helmet.glb')}"
               alt="WW2 Helmet"
               auto-rotate
               camera-controls
@@ -91,24 +87,97 @@ components.html(f"""
 # --------------------
 # Chat history
 # --------------------
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Bounded history: only the last HISTORY_WINDOW messages live in memory,
+# older ones are spilled to data/sessions/ and loaded page by page on demand.
+if "history" not in st.session_state:
+    # Each new session also sweeps spill files of sessions idle for too long
+    prune_sessions()
+    st.session_state.history = ChatHistory(uuid.uuid4().hex)
+    st.session_state.older_shown = 0
+history = st.session_state.history
 
 # --------------------
 # Model selection sidebar
 # --------------------
+if api_client.RAG_API_URL:
+    try:
+        engine = api_client.model_status()
+    except requests.RequestException as e:
+        st.error(f"RAG API at {api_client.RAG_API_URL} is not available: {e}")
+        st.stop()
+    model_states = engine["models"]
+    DEFAULT_BUDGET_S = engine["default_budget_s"]
+    select_model = api_client.select_model
+else:
+    model_pool = get_model_pool()
+    model_states = model_pool.status()
+    select_model = model_pool.select
+AVAILABLE_MODELS = list(model_states)
+
 model_choice = st.sidebar.selectbox(
     "Select model:",
-    ["qwen2.5:7b-instruct", "deepseek-r1:7b", "llama3.1:8b", "mistral:7b-instruct"]
+    AVAILABLE_MODELS
 )
 
 st.sidebar.write(f"**Current model:** `{model_choice}`")
 
+# Keep the chosen model resident in Ollama (the engine's, in thin-client mode)
+# and warm up the likely next one
+if st.session_state.get("last_model") != model_choice:
+    select_model(model_choice, previous=st.session_state.get("last_model"))
+    st.session_state.last_model = model_choice
+
+MODEL_STATE_ICONS = {"loaded": "🟢 loaded", "loading": "🟡 loading", "cold": "⚪ cold"}
+st.sidebar.caption("  \n".join(
+    f"`{name}` {MODEL_STATE_ICONS[state]}" for name, state in model_states.items()
+))
+
+budget_s = st.sidebar.slider("Time limit (s)", 10, 180, DEFAULT_BUDGET_S)
+
+# Side-by-side mode: one retrieval, several models (runs in-process, so not in thin-client mode)
+compare_mode = st.sidebar.checkbox(
+    "Compare models side by side",
+    disabled=bool(api_client.RAG_API_URL),
+    help="Not available when RAG_API_URL is set" if api_client.RAG_API_URL else None,
+)
+compare_choice = []
+if compare_mode:
+    compare_choice = st.sidebar.multiselect("Models to compare:", AVAILABLE_MODELS,
+                                            default=AVAILABLE_MODELS[:2])
+
+# --------------------
+# Optional retrieval filters (narrow the kNN search)
+# --------------------
+with st.sidebar.expander("Search filters"):
+    use_years = st.checkbox("Filter by period")
+    year_from, year_to = st.slider("Years", 1900, 1960, (1939, 1945), disabled=not use_years)
+    location_filter = st.text_input("Location (exact)", "")
+    person_filter = st.text_input("Person / organisation (exact)", "")
+
+filters = {}
+if use_years:
+    filters.update({"year_from": year_from, "year_to": year_to})
+if location_filter.strip():
+    filters["location"] = location_filter.strip()
+if person_filter.strip():
+    filters["person"] = person_filter.strip()
+filters = filters or None
+
+# Deletes this session's messages, including the ones spilled to disk
+if st.sidebar.button("Clear chat"):
+    history.clear()
+    st.session_state.older_shown = 0
+
 # --------------------
 # Display existing chat messages
 # --------------------
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"], avatar=msg["avatar"]):
+if history.spilled > st.session_state.older_shown:
+    hidden = history.spilled - st.session_state.older_shown
+    if st.button(f"Show earlier messages ({hidden} hidden)"):
+        st.session_state.older_shown += HISTORY_PAGE_SIZE
+
+for msg in [*history.older(st.session_state.older_shown), *history.recent]:
+    with st.chat_message(msg["role"], avatar=load_static_bytes(msg["avatar"])):
         st.markdown(msg["content"])
 # --------------------
 # User chat input
@@ -120,24 +189,82 @@ user_input = st.chat_input("Ask about World War II...")
 if user_input:
 
     # Save user message WITH avatar
-    st.session_state.messages.append({
+    history.append({
         "role": "user",
         "content": user_input,
-        "avatar": "static/truman.png"
+        "avatar": "truman.png"
     })
 
-    with st.chat_message("user", avatar="static/truman.png"):
+    with st.chat_message("user", avatar=load_static_bytes("truman.png")):
         st.markdown(user_input)
 
     # Assistant response
-    with st.chat_message("assistant", avatar="static/churchill.png"):
-        with st.spinner("Thinking..."):
-            answer = answer_question(user_input, model=model_choice)
-            st.markdown(answer)
+    with st.chat_message("assistant", avatar=load_static_bytes("churchill.png")):
+        if compare_mode and compare_choice:
+            with st.spinner("Retrieving..."):
+                _, runs = compare_models(user_input, compare_choice, filters=filters)
+
+            columns = st.columns(len(runs))
+            slots = []
+            for col, run in zip(columns, runs):
+                with col:
+                    st.markdown(f"**`{run.model}`**")
+                    slots.append((st.empty(), st.empty()))
+
+            def render(run, body, stats):
+                if run.drain():
+                    body.markdown(run.text)
+                if run.error:
+                    stats.caption(f"⚠️ {run.error}")
+                elif run.latency_s is not None:
+                    tps = f" · {run.tokens_per_s:.1f} tok/s" if run.tokens_per_s else ""
+                    wait = f" · {run.queue_wait_s:.1f} s en cola" if run.queue_wait_s >= 0.1 else ""
+                    stats.caption(f"{run.latency_s:.1f} s{tps}{wait}")
+                else:
+                    stats.caption("En cola..." if run.first_token_at is None else "Generando...")
+
+            while not all(run.done() for run in runs):
+                for run, (body, stats) in zip(runs, slots):
+                    render(run, body, stats)
+                time.sleep(0.1)
+            for run, (body, stats) in zip(runs, slots):
+                render(run, body, stats)
+
+            answer = "\n\n".join(f"**{run.model}**\n\n{run.text}" for run in runs)
+        elif api_client.RAG_API_URL:
+            # Modo cliente fino: el motor RAG corre en src/server.py
+            final = {}
+            answer = st.write_stream(api_client.stream_answer(
+                user_input, model=model_choice, filters=filters,
+                budget_s=budget_s, on_done=final.update,
+            ))
+            if final.get("degradations"):
+                st.caption("⚠️ " + ", ".join(final["degradations"]))
+        else:
+            with st.spinner("Thinking..."):
+                # Feedback de la cola compartida mientras esperamos a Ollama
+                queue_status = st.empty()
+
+                def show_queue_position(position):
+                    if position > 0:
+                        queue_status.caption(f"En cola: posición {position}")
+                    else:
+                        queue_status.caption("Generando respuesta...")
+
+                result = answer_with_budget(
+                    user_input, model=model_choice, filters=filters,
+                    budget_s=budget_s, progress=show_queue_position,
+                )
+                queue_status.empty()
+
+                answer = result["answer"]
+                st.markdown(answer)
+                if result["degradations"]:
+                    st.caption("⚠️ " + ", ".join(result["degradations"]))
 
     # Save assistant message WITH avatar
-    st.session_state.messages.append({
+    history.append({
         "role": "assistant",
         "content": answer,
-        "avatar": "static/churchill.png"
+        "avatar": "churchill.png"
     })
\ No newline at end of file
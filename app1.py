@@ -1,10 +1,8 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import os
-import base64
 
 from src.rag_pipeline import answer_question
-from src.utils import wrap_letters
+from src.utils import wrap_letters, static_url
 
 # -----------------------
 # Basic page config
@@ -12,34 +10,30 @@ from src.utils import wrap_letters
 st.set_page_config(page_title="WW2 RAG Chat", page_icon="🪖", layout="wide")
 
 # -----------------------
-# Embed local Fraktur font
+# Local Fraktur font (served from /app/static, cached by the browser)
 # -----------------------
-font_path = "static/fonts/fraktur_regular.ttf"  # make sure this path exists
-
-if os.path.exists(font_path):
-    with open(font_path, "rb") as f:
-        fraktur_base64 = base64.b64encode(f.read()).decode()
-
-    font_css = f"""
-    <style>
-    @font-face {{
-        font-family: "FrakturWW2";
-        src: url("data:font/ttf;base64,{fraktur_base64}") format("truetype");
-        font-weight: normal;
-        font-style: normal;
-    }}
-    </style>
-    """
-    st.markdown(font_css, unsafe_allow_html=True)
-else:
-    st.warning("Fraktur font file not found at static/fonts/fraktur_regular.ttf")
+font_css = f"""
+<style>
+@font-face {{
+    font-family: "FrakturWW2";
+    src: url("{static_url('fonts/fraktur_regular.ttf')}") format("truetype");
+    font-weight: normal;
+    font-style: normal;
+}}
+</style>
+"""
+st.markdown(font_css, unsafe_allow_html=True)
 
 # -----------------------
 # Load external CSS
 # -----------------------
-def local_css(file_name: str):
+@st.cache_resource
+def read_css(file_name: str) -> str:
     with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        return f.read()
+
+def local_css(file_name: str):
+    st.markdown(f"<style>{read_css(file_name)}</style>", unsafe_allow_html=True)
 
 local_css("app1.css")
 
@@ -64,39 +58,32 @@ with col_helmet:
         unsafe_allow_html=True,
     )
 
-    # Load helmet base64
-    helmet_b64_path = "static/helmet_base64.txt"
-    if os.path.exists(helmet_b64_path):
-        with open(helmet_b64_path) as f:
-            b64 = f.read()
-
-        components.html(
-            f"""
-            <style>
-                body {{ margin: 0; background: transparent; }}
-                model-viewer {{
-                    width: 100%;
-                    height: 450px;
-                    outline: none;
-                }}
-            </style>
-
-            <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
-
-            <model-viewer src="data:model/gltf-binary;base64,{b64}"
-                          alt="WW2 Helmet"
-                          auto-rotate
-                          camera-controls
-                          disable-zoom
-                          interaction-prompt="none"
-                          orbit-sensitivity="1"
-                          exposure="1.2">
-            </model-viewer>
-            """,
-            height=470,
-        )
-    else:
-        st.error("helmet_base64.txt not found in static/")
+    # Helmet GLB, fetched once by the browser from /app/static
+    components.html(
+        f"""
+        <style>
+            body {{ margin: 0; background: transparent; }}
+            model-viewer {{
+                width: 100%;
+                height: 450px;
+                outline: none;
+            }}
+        </style>
+
+        <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
+
+        <model-viewer src="{static_url('helmet.glb')}"
+                      alt="WW2 Helmet"
+                      auto-rotate
+                      camera-controls
+                      disable-zoom
+                      interaction-prompt="none"
+                      orbit-sensitivity="1"
+                      exposure="1.2">
+        </model-viewer>
+        """,
+        height=470,
+    )
 
 # ---------- RIGHT: CHAT PANEL ----------
 with col_chat:
@@ -169,7 +156,7 @@ with col_chat:
             {
                 "role": "user",
                 "content": user_input,
-                "avatar": "static/truman.png",  # path relative to Streamlit static root
+                "avatar": static_url("truman.png"),
             }
         )
 
@@ -182,7 +169,7 @@ with col_chat:
             {
                 "role": "assistant",
                 "content": answer,
-                "avatar": "static/churchill.png",
+                "avatar": static_url("churchill.png"),
             }
         )
 
@@ -0,0 +1,228 @@
+# src/ann_tuner.py
+#
+# Ajuste de la búsqueda aproximada (HNSW) frente a la búsqueda exacta:
+#
+#   1. verdad de referencia: top-k por coseno exacto (numpy) sobre todos los chunks
+#   2. para cada (m, ef_construction) se construye un índice temporal con los
+#      mismos vectores y se barren k y num_candidates
+#   3. se imprime la frontera de Pareto recall@k / p95 ms / memoria y la
+#      configuración más rápida que alcanza el recall objetivo
+#
+# Las queries son los topics de los artículos, embebidos como preguntas.
+#
+#   python src/ann_tuner.py --queries 200 --target-recall 0.95
+
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+from elasticsearch import helpers
+from tqdm import tqdm
+
+from embedder import embed_queries
+from indexer import (
+    HNSW_EF_CONSTRUCTION, HNSW_M, INDEX_NAME, embedding_mapping, get_es_client, iter_records,
+)
+
+M_SWEEP = [8, 16, 32]
+EF_CONSTRUCTION_SWEEP = [50, 100, 200]
+NUM_CANDIDATES_SWEEP = [10, 20, 50, 100, 200, 500]
+K_SWEEP = [5, 10]
+TARGET_RECALL = 0.95
+
+TUNING_INDEX_PREFIX = f"{INDEX_NAME}_tune"
+# Queries que se lanzan antes de medir cada índice
+WARMUP_QUERIES = 20
+
+
+def load_corpus(client) -> tuple[list[str], np.ndarray]:
+    """
+    (_id, embedding) de todos los chunks del índice publicado.
+    """
+    ids, vectors = [], []
+    hits = helpers.scan(client, index=INDEX_NAME,
+                        query={"query": {"match_all": {}}, "_source": ["embedding"]})
+    for hit in tqdm(hits, desc=f"Reading {INDEX_NAME}"):
+        ids.append(hit["_id"])
+        vectors.append(hit["_source"]["embedding"])
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def sample_queries(n: int, seed: int = 0) -> list[str]:
+    topics = [rec.get("topic", "") for rec in iter_records()]
+    topics = [t for t in topics if isinstance(t, str) and t.strip()]
+    random.Random(seed).shuffle(topics)
+    return topics[:n]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Índices de los k chunks más parecidos por coseno, ordenados.
+    """
+    scores = _normalize(queries) @ _normalize(corpus).T
+    idx = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1)
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def _p95(values: list[float]) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=20)[-1]
+
+
+def hnsw_memory_mb(n_vectors: int, dims: int, m: int) -> float:
+    """
+    Memoria aproximada que ES quiere fuera del heap: vectores float32 más
+    los vecinos de la capa 0 del grafo (hasta 2*m por nodo).
+    """
+    return n_vectors * 4 * (dims + 2 * m) / 1e6
+
+
+def build_tuning_index(client, index_name: str, ids: list[str], vectors: np.ndarray,
+                       m: int, ef_construction: int):
+    client.indices.delete(index=index_name, ignore_unavailable=True)
+    client.indices.create(index=index_name, body={
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0, "refresh_interval": "-1"},
+        "mappings": {"properties": {"embedding": embedding_mapping(m, ef_construction)}},
+    })
+    actions = (
+        {"_index": index_name, "_id": doc_id, "_source": {"embedding": vec.tolist()}}
+        for doc_id, vec in zip(ids, vectors)
+    )
+    helpers.bulk(client, actions, chunk_size=500)
+    client.indices.refresh(index=index_name)
+    # Un segmento = un grafo, como en el índice publicado
+    client.options(request_timeout=1800).indices.forcemerge(
+        index=index_name, max_num_segments=1, wait_for_completion=True,
+    )
+
+
+def knn_ids(client, index_name: str, vector: list, k: int, num_candidates: int) -> tuple[list[str], float]:
+    start = time.perf_counter()
+    resp = client.search(index=index_name, size=k, source=False, knn={
+        "field": "embedding",
+        "query_vector": vector,
+        "k": k,
+        "num_candidates": num_candidates,
+    })
+    ms = (time.perf_counter() - start) * 1000
+    return [h["_id"] for h in resp["hits"]["hits"]], ms
+
+
+def measure(client, index_name: str, queries: list[list], truth: list[list[str]],
+            k: int, num_candidates: int) -> tuple[float, float]:
+    recalls, latencies = [], []
+    for vec, expected in zip(queries, truth):
+        found, ms = knn_ids(client, index_name, vec, k, num_candidates)
+        expected = set(expected[:k])
+        recalls.append(len(expected & set(found)) / len(expected))
+        latencies.append(ms)
+    return statistics.mean(recalls), _p95(latencies)
+
+
+def pareto_frontier(results: list[dict]) -> list[dict]:
+    """
+    Configuraciones que ninguna otra supera a la vez en recall (más),
+    p95 (menos) y memoria (menos).
+    """
+    def dominates(a: dict, b: dict) -> bool:
+        no_worse = a["recall"] >= b["recall"] and a["p95_ms"] <= b["p95_ms"] and a["memory_mb"] <= b["memory_mb"]
+        better = a["recall"] > b["recall"] or a["p95_ms"] < b["p95_ms"] or a["memory_mb"] < b["memory_mb"]
+        return no_worse and better
+
+    frontier = [r for r in results if not any(dominates(o, r) for o in results)]
+    return sorted(frontier, key=lambda r: (-r["recall"], r["p95_ms"]))
+
+
+def recommend(results: list[dict], target_recall: float) -> dict | None:
+    """
+    La más rápida que llega al recall objetivo (a igualdad, la que menos memoria usa).
+    """
+    ok = [r for r in results if r["recall"] >= target_recall]
+    if not ok:
+        return None
+    return min(ok, key=lambda r: (r["p95_ms"], r["memory_mb"]))
+
+
+def _print_rows(rows: list[dict], k: int):
+    print(f"{'m':>4}{'ef_constr':>11}{'num_cand':>10}{'recall@' + str(k):>11}{'p95 ms':>9}{'mem MB':>9}")
+    for r in rows:
+        print(f"{r['m']:>4}{r['ef_construction']:>11}{r['num_candidates']:>10}"
+              f"{r['recall']:>11.3f}{r['p95_ms']:>9.1f}{r['memory_mb']:>9.1f}")
+
+
+def tune(n_queries: int = 200, target_recall: float = TARGET_RECALL, keep_indices: bool = False):
+    client = get_es_client()
+    ids, corpus = load_corpus(client)
+    topics = sample_queries(n_queries)
+    if not ids or not topics:
+        print(f"[WARN] Nothing to tune: {len(ids)} chunks, {len(topics)} queries")
+        return
+    # Mismas dimensiones que el índice (aplica la proyección PCA si la hay)
+    queries = embed_queries(topics)
+    max_k = min(max(K_SWEEP), len(ids) - 1)
+    truth_idx = exact_top_k(corpus, np.asarray(queries, dtype=np.float32), max_k)
+    truth = [[ids[i] for i in row] for row in truth_idx.tolist()]
+    print(f"[INFO] {len(ids)} chunks, {len(queries)} queries, exact top-{max_k} computed")
+
+    results = {k: [] for k in K_SWEEP if k <= max_k}
+    for m in M_SWEEP:
+        for ef_construction in EF_CONSTRUCTION_SWEEP:
+            print(f"[INFO] Building m={m} ef_construction={ef_construction}...")
+            index_name = f"{TUNING_INDEX_PREFIX}_m{m}_ef{ef_construction}"
+            memory_mb = hnsw_memory_mb(len(ids), corpus.shape[1], m)
+            try:
+                build_tuning_index(client, index_name, ids, corpus, m, ef_construction)
+
+                for vec in queries[:WARMUP_QUERIES]:
+                    knn_ids(client, index_name, vec, max_k, max(NUM_CANDIDATES_SWEEP))
+
+                for k in results:
+                    for num_candidates in NUM_CANDIDATES_SWEEP:
+                        if num_candidates < k:
+                            continue
+                        recall, p95 = measure(client, index_name, queries, truth, k, num_candidates)
+                        results[k].append({
+                            "m": m, "ef_construction": ef_construction,
+                            "num_candidates": num_candidates, "k": k,
+                            "recall": recall, "p95_ms": p95, "memory_mb": memory_mb,
+                        })
+            finally:
+                # Cada índice es una copia entera de los vectores: fuera en cuanto se mide,
+                # para no tener nueve grafos junto al índice publicado en el mismo nodo
+                if not keep_indices:
+                    client.indices.delete(index=index_name, ignore_unavailable=True)
+
+    for k, rows in results.items():
+        print(f"\n=== k={k}: Pareto frontier (recall@{k} vs p95 latency vs memory) ===")
+        _print_rows(pareto_frontier(rows), k)
+
+        best = recommend(rows, target_recall)
+        if best is None:
+            top = max(rows, key=lambda r: r["recall"])
+            print(f"[WARN] No configuration reaches recall@{k} >= {target_recall}; "
+                  f"best is {top['recall']:.3f} (m={top['m']}, ef_construction={top['ef_construction']}, "
+                  f"num_candidates={top['num_candidates']})")
+            continue
+        print(f"\n[OK] k={k}, target recall {target_recall}: "
+              f"HNSW_M={best['m']}, HNSW_EF_CONSTRUCTION={best['ef_construction']} (src/indexer.py), "
+              f"NUM_CANDIDATES={best['num_candidates']} (src/retriever.py) "
+              f"-> recall {best['recall']:.3f}, p95 {best['p95_ms']:.1f} ms, ~{best['memory_mb']:.1f} MB "
+              f"(current: m={HNSW_M}, ef_construction={HNSW_EF_CONSTRUCTION})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune HNSW / num_candidates against exact search")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--target-recall", type=float, default=TARGET_RECALL)
+    parser.add_argument("--keep-indices", action="store_true",
+                        help="Do not delete the temporary tuning indices")
+    args = parser.parse_args()
+    tune(args.queries, args.target_recall, args.keep_indices)
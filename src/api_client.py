@@ -0,0 +1,55 @@
+# src/api_client.py
+#
+# Cliente fino del servicio HTTP (src/server.py) para que la UI no tenga
+# que cargar ES, embeddings ni Ollama en su propio proceso.
+
+import json
+import os
+from typing import Callable, Iterator
+
+import requests
+
+# Si no está definida, app.py sigue usando el pipeline en proceso.
+RAG_API_URL = os.environ.get("RAG_API_URL", "").rstrip("/")
+TIMEOUT = 180
+
+
+def model_status() -> dict:
+    """
+    {"models": {modelo: "loaded" | "loading" | "cold"}, "default_budget_s": ...}
+    según el Ollama del motor, no el de la máquina de la UI.
+    """
+    resp = requests.get(f"{RAG_API_URL}/models", timeout=10)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def select_model(model: str, previous: str | None = None):
+    resp = requests.post(f"{RAG_API_URL}/models/select",
+                         json={"model": model, "previous": previous}, timeout=10)
+    resp.raise_for_status()
+
+
+def stream_answer(question: str, k: int = 5, model: str = "qwen2.5:7b-instruct",
+                  filters: dict | None = None, budget_s: float | None = None,
+                  on_done: Callable[[dict], None] | None = None) -> Iterator[str]:
+    """
+    Devuelve los tokens según llegan del endpoint /answer/stream.
+    on_done recibe el evento final (sources, y partial/degradations con budget_s).
+    """
+    with requests.post(
+        f"{RAG_API_URL}/answer/stream",
+        json={"question": question, "k": k, "model": model, "filters": filters,
+              "budget_s": budget_s},
+        stream=True,
+        timeout=TIMEOUT,
+    ) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if "token" in event:
+                yield event["token"]
+            elif event.get("done") and on_done is not None:
+                on_done(event)
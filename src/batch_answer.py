@@ -0,0 +1,218 @@
+# src/batch_answer.py
+#
+# Responde un fichero de preguntas en lote, en tubería:
+#
+#   embeddings por lotes -> _msearch por lotes -> cola acotada -> LLM -> JSONL
+#
+# El LLM es el cuello de botella, así que la preparación (embeddings y
+# búsqueda) va por delante en otro hilo y la cola nunca lo deja esperando.
+# Cada respuesta se escribe en cuanto termina: si se interrumpe, al relanzar
+# con la misma salida se saltan las preguntas ya respondidas.
+#
+#   python -m src.batch_answer data/questions.jsonl data/answers.jsonl
+#
+# Entrada: una pregunta por línea, {"id": ..., "question": ...} (el id es
+# opcional; por defecto, el número de línea).
+
+import argparse
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+from src.embedder import embed_queries
+from src.rag_pipeline import MODEL_NAME, build_contexts, build_prompt, call_ollama
+from src.retriever import get_es_client, msearch_vectors
+from src.scheduler import MAX_CONCURRENT_GENERATIONS
+
+INPUT_PATH = Path("data/questions.jsonl")
+OUTPUT_PATH = Path("data/answers.jsonl")
+# Preguntas que se embeben y buscan de una vez
+PREP_BATCH_SIZE = 32
+# Prompts preparados esperando al LLM, por cada generación en paralelo
+QUEUE_PER_WORKER = 4
+
+_DONE = object()
+
+
+def load_questions(path: Path) -> list[dict]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            question = (rec.get("question") or "").strip()
+            if question:
+                questions.append({"id": str(rec.get("id", line_no)), "question": question})
+    return questions
+
+
+def answered_ids(path: Path) -> set[str]:
+    """
+    Ids ya presentes en la salida. Una última línea a medias (proceso
+    matado mientras escribía) se ignora y esa pregunta se repite.
+    """
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return done
+
+
+def _prepare(pending: list[dict], k: int, filters: dict | None, out: queue.Queue,
+             n_workers: int, stop: threading.Event, failed: list[str]):
+    """
+    Productor: embebe y busca por lotes y encola los prompts. put() bloquea
+    cuando la cola está llena, así no adelanta más de lo que el LLM consume.
+    """
+    try:
+        client = get_es_client()
+        for start in range(0, len(pending), PREP_BATCH_SIZE):
+            if stop.is_set():
+                break
+            batch = pending[start:start + PREP_BATCH_SIZE]
+
+            t0 = time.perf_counter()
+            vectors = embed_queries([q["question"] for q in batch])
+            t1 = time.perf_counter()
+            results = msearch_vectors(client, vectors, k=k, filters=filters)
+            t2 = time.perf_counter()
+
+            # Tiempo de cada etapa repartido entre las preguntas del lote
+            embed_ms = (t1 - t0) * 1000 / len(batch)
+            search_ms = (t2 - t1) * 1000 / len(batch)
+            for q, hits in zip(batch, results):
+                if hits is None:
+                    # Sin contexto la respuesta no vale: no se escribe y se repite al relanzar
+                    print(f"[WARN] {q['id']}: retrieval failed")
+                    failed.append(q["id"])
+                    continue
+                out.put({
+                    **q,
+                    "hits": hits,
+                    "prompt": build_prompt(q["question"], build_contexts(hits)),
+                    "timings": {"embed_ms": round(embed_ms, 1), "search_ms": round(search_ms, 1)},
+                    "queued_at": time.perf_counter(),
+                })
+    except Exception as e:
+        print(f"[ERROR] Preparation failed: {e}")
+        stop.set()
+        failed.append("<preparation>")
+    finally:
+        for _ in range(n_workers):
+            out.put(_DONE)
+
+
+def _generate(jobs: queue.Queue, model: str, write, stop: threading.Event, failed: list[str]):
+    while True:
+        job = jobs.get()
+        if job is _DONE:
+            return
+        if stop.is_set():
+            continue
+        start = time.perf_counter()
+        try:
+            answer = call_ollama(job["prompt"], model)
+        except Exception as e:
+            # No se escribe: al relanzar se vuelve a intentar
+            print(f"[WARN] {job['id']}: generation failed: {e}")
+            failed.append(job["id"])
+            continue
+        end = time.perf_counter()
+
+        write({
+            "id": job["id"],
+            "question": job["question"],
+            "answer": answer,
+            "sources": [{"topic": h.get("topic", ""), "url": h.get("url", "")} for h in job["hits"]],
+            "model": model,
+            "timings": {
+                **job["timings"],
+                "queue_ms": round((start - job["queued_at"]) * 1000, 1),
+                "generate_ms": round((end - start) * 1000, 1),
+            },
+        })
+
+
+def run(input_path: Path = INPUT_PATH, output_path: Path = OUTPUT_PATH, k: int = 5,
+        model: str = MODEL_NAME, filters: dict | None = None,
+        workers: int = MAX_CONCURRENT_GENERATIONS):
+    questions = load_questions(input_path)
+    done = answered_ids(output_path)
+    pending = [q for q in questions if q["id"] not in done]
+    print(f"[INFO] {len(questions)} questions, {len(questions) - len(pending)} already answered, "
+          f"{len(pending)} pending")
+    if not pending:
+        return
+
+    workers = max(1, workers)
+    jobs: queue.Queue = queue.Queue(maxsize=workers * QUEUE_PER_WORKER)
+    stop = threading.Event()
+    failed: list[str] = []
+    write_lock = threading.Lock()
+    written = 0
+    started = time.perf_counter()
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(record: dict):
+            nonlocal written
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                written += 1
+                if written % 10 == 0 or written == len(pending):
+                    rate = written / (time.perf_counter() - started)
+                    print(f"[INFO] {written}/{len(pending)} answered ({rate:.2f} q/s)")
+
+        threads = [threading.Thread(target=_prepare, name="batch-prepare", daemon=True,
+                                    args=(pending, k, filters, jobs, workers, stop, failed))]
+        threads += [threading.Thread(target=_generate, name=f"batch-generate-{i}", daemon=True,
+                                     args=(jobs, model, write, stop, failed))
+                    for i in range(workers)]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=0.5)
+        except KeyboardInterrupt:
+            # Lo escrito ya está a salvo; relanzar continúa desde ahí
+            stop.set()
+            print(f"\n[WARN] Interrupted after {written} answers; rerun to resume.")
+            return
+
+    elapsed = time.perf_counter() - started
+    if stop.is_set():
+        print(f"[ERROR] Stopped after {written}/{len(pending)} answers ({elapsed:.1f}s); rerun to resume.")
+    elif failed:
+        print(f"[WARN] {written}/{len(pending)} answers written to {output_path} in {elapsed:.1f}s; "
+              f"{len(failed)} failed and will be retried on the next run.")
+    else:
+        print(f"[OK] {written} answers written to {output_path} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipelined batch question answering")
+    parser.add_argument("input", nargs="?", type=Path, default=INPUT_PATH,
+                        help="JSONL with one {\"id\", \"question\"} per line")
+    parser.add_argument("output", nargs="?", type=Path, default=OUTPUT_PATH,
+                        help="JSONL answers; existing ids are skipped (resume)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_GENERATIONS,
+                        help="Concurrent generations sent to Ollama")
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    args = parser.parse_args()
+
+    filters = {key: val for key, val in
+               (("year_from", args.year_from), ("year_to", args.year_to)) if val is not None}
+    run(args.input, args.output, args.k, args.model, filters or None, args.workers)
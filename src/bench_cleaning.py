@@ -0,0 +1,75 @@
+# src/bench_cleaning.py
+#
+# Benchmark de limpieza de HTML: BeautifulSoup (original) vs html_cleaner
+# (una pasada) en serie y con pool de procesos, sobre HTML guardado en disco.
+#
+#   python src/bench_cleaning.py --fetch 30     # guarda 30 páginas en data/html_fixtures/
+#   python src/bench_cleaning.py                # ejecuta el benchmark
+
+import argparse
+import os
+import re
+import time
+from pathlib import Path
+
+import wikipedia
+
+from download_wikipedia import WW2_TITLES, clean_wikipedia_content_bs4
+from html_cleaner import clean_html, clean_many
+
+FIXTURES_DIR = Path("data/html_fixtures")
+
+
+def save_fixtures(n: int):
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    wikipedia.set_lang("en")
+    saved = 0
+    for title in WW2_TITLES:
+        if saved >= n:
+            break
+        try:
+            html = wikipedia.page(title, auto_suggest=False).html()
+        except Exception:
+            print(f"[WARN] Could not fetch '{title}'")
+            continue
+        name = re.sub(r"[^A-Za-z0-9]+", "_", title).strip("_")
+        (FIXTURES_DIR / f"{name}.html").write_text(html, encoding="utf-8")
+        saved += 1
+    print(f"[OK] Saved {saved} fixtures to {FIXTURES_DIR}")
+
+
+def _bench(name: str, fn, htmls: list[str], total_mb: float) -> list[str]:
+    start = time.perf_counter()
+    out = fn(htmls)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22}{elapsed:>9.2f}s{len(htmls) / elapsed:>11.1f}{total_mb / elapsed:>10.1f}")
+    return out
+
+
+def run(repeat: int = 1, workers: int | None = None):
+    paths = sorted(FIXTURES_DIR.glob("*.html"))
+    if not paths:
+        print(f"[WARN] No fixtures in {FIXTURES_DIR}; run with --fetch N first.")
+        return
+    htmls = [p.read_text(encoding="utf-8") for p in paths] * repeat
+    total_mb = sum(len(h.encode("utf-8")) for h in htmls) / 1e6
+    print(f"[INFO] {len(htmls)} pages, {total_mb:.1f} MB, {workers or os.cpu_count()} workers\n")
+
+    print(f"{'engine':<22}{'time':>10}{'pages/s':>11}{'MB/s':>10}")
+    reference = _bench("bs4 (serial)", lambda hs: [clean_wikipedia_content_bs4(h) for h in hs], htmls, total_mb)
+    fast = _bench("fast (serial)", lambda hs: [clean_html(h) for h in hs], htmls, total_mb)
+    _bench("fast (process pool)", lambda hs: clean_many(hs, workers=workers), htmls, total_mb)
+
+    same = sum(a == b for a, b in zip(reference, fast))
+    print(f"\n[INFO] Identical output on {same}/{len(htmls)} pages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTML cleaning benchmark")
+    parser.add_argument("--fetch", type=int, default=0, help="Download N pages as fixtures first")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the fixture set N times")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    if args.fetch:
+        save_fixtures(args.fetch)
+    run(args.repeat, args.workers)
@@ -0,0 +1,90 @@
+import hashlib
+import re
+
+import numpy as np
+
+# Similitud Jaccard (sobre shingles de palabras) a partir de la cual dos chunks
+# se consideran casi-duplicados. None desactiva la deduplicación.
+DEDUP_THRESHOLD = 0.8
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+# Primo > 2^32: con a, b, h < 2^32 el producto cabe en uint64 sin desbordar
+_PRIME = np.uint64(4294967311)
+_WORD = re.compile(r"\w+")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """
+    Elige (bandas, filas) con bandas*filas <= num_perm cuyo umbral LSH
+    aproximado (1/b)^(1/r) quede más cerca del umbral pedido.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashDeduplicator:
+    """
+    Deduplicación incremental con MinHash + LSH por bandas.
+    Cada texto nuevo se compara solo con los que caen en algún bucket común.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = NUM_PERM,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        n = self.bands * self.rows
+        self._a = rng.integers(1, 2**32, size=n, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=n, dtype=np.uint64)
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: list[np.ndarray] = []
+        self.dropped = 0
+
+    def signature(self, text: str) -> np.ndarray | None:
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+             for g in grams),
+            dtype=np.uint64, count=len(grams),
+        )
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        True si `text` es casi-duplicado de alguno ya visto; si no, lo registra.
+        """
+        sig = self.signature(text)
+        if sig is None:
+            return False
+
+        keys = [sig[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        for idx in candidates:
+            if np.mean(self._signatures[idx] == sig) >= self.threshold:
+                self.dropped += 1
+                return True
+
+        idx = len(self._signatures)
+        self._signatures.append(sig)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(idx)
+        return False
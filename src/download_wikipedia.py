@@ -1,6 +1,8 @@
 import os
 import json
 import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 import requests
 from bs4 import BeautifulSoup
@@ -8,6 +10,8 @@ from bs4 import BeautifulSoup
 import wikipedia
 from tqdm import tqdm
 
+from html_cleaner import clean_html, clean_many
+
 RELEVANT_KEYWORDS = [
     "war", "world war", "battle", "operation", "campaign", "front",
     "invasion", "occupation", "resistance", "allies", "axis",
@@ -26,11 +30,26 @@ OUTPUT_PATH = Path("data/raw_wiki.jsonl")
 # --- LLM (Ollama) config for structured summaries ---
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "qwen2.5:7b-instruct"  # or any other model you prefer from your local list
+
+# "fast": parser en streaming de html_cleaner (una pasada, pool de procesos)
+# "bs4":  implementación original con BeautifulSoup
+CLEANING_ENGINE = "fast"
+# Procesos para limpiar HTML en paralelo (None = nº de CPUs)
+CLEANING_WORKERS = None
+# Páginas que se descargan, limpian y resumen juntas: solo ese HTML está en memoria
+PAGE_BATCH_SIZE = 32
+STRUCTURED_PATH = Path("data/processed_wikipedia_structured.jsonl")
+
 def clean_wikipedia_content(html: str) -> str:
     """
     Limpia el HTML de Wikipedia eliminando tablas, referencias, índice, etc.
     Devuelve solo texto plano útil para el resumen y el RAG.
     """
+    if CLEANING_ENGINE == "fast":
+        return clean_html(html)
+    return clean_wikipedia_content_bs4(html)
+
+def clean_wikipedia_content_bs4(html: str) -> str:
     soup = BeautifulSoup(html, "html.parser")
 
     # Eliminar elementos que normalmente no aportan al contexto histórico
@@ -132,15 +151,18 @@ Texto:
         "date": "",
     }
 
-def build_rag_record_from_page(title: str, html: str, url: str | None = None) -> dict:
+def build_rag_record_from_page(title: str, html: str, url: str | None = None,
+                               cleaned_text: str | None = None) -> dict:
     """
     Dado un título de Wikipedia, su HTML y su URL,
     genera un registro completo listo para indexar en el RAG.
 
     Mantiene el mismo nivel de contexto que el pipeline actual
     (texto largo completo) pero añade una capa estructurada con el LLM.
+    Si el texto ya viene limpio (p.ej. del pool de procesos), no se vuelve a limpiar.
     """
-    cleaned_text = clean_wikipedia_content(html)
+    if cleaned_text is None:
+        cleaned_text = clean_wikipedia_content(html)
     structured = summarize_with_llm(title, cleaned_text)
 
     record = {
@@ -330,58 +352,78 @@ def expand_links(page_data: dict, max_links: int = 20) -> list[str]:
     except Exception:
         return []
 
+def fetch_html(data: dict) -> str:
+    # Intentar obtener HTML real de la página para limpieza
+    try:
+        page_obj = wikipedia.page(data["title"], auto_suggest=False)
+        return page_obj.html()
+    except Exception:
+        return data.get("content", "")
+
+def build_records(pages: list[tuple[dict, str]], pool: Executor | None = None) -> list[dict]:
+    """
+    Limpia un lote de páginas en paralelo y luego pasa cada una por el LLM.
+    """
+    htmls = [html for _, html in pages]
+    if CLEANING_ENGINE == "fast":
+        cleaned = clean_many(htmls, workers=CLEANING_WORKERS, pool=pool)
+    else:
+        cleaned = [clean_wikipedia_content(h) for h in htmls]
+
+    records = []
+    for (data, html), text in tqdm(list(zip(pages, cleaned)), desc="Summarizing"):
+        records.append(build_rag_record_from_page(
+            data.get("title", None), html, url=data.get("url", None), cleaned_text=text,
+        ))
+    return records
+
 def main():
     os.makedirs(OUTPUT_PATH.parent, exist_ok=True)
+    STRUCTURED_PATH.parent.mkdir(parents=True, exist_ok=True)
     collected = set(WW2_TITLES)
-    structured_records: list[dict] = []
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+    batch: list[tuple[dict, str]] = []
+    # Un solo pool para todo el crawl: arrancarlo por lote cuesta más que la limpieza
+    use_pool = CLEANING_ENGINE == "fast" and CLEANING_WORKERS != 1
+    pool_ctx = ProcessPoolExecutor(max_workers=CLEANING_WORKERS) if use_pool else nullcontext()
+
+    with pool_ctx as pool, \
+            open(OUTPUT_PATH, "w", encoding="utf-8") as raw_f, \
+            STRUCTURED_PATH.open("w", encoding="utf-8") as out_f:
+
+        def flush():
+            # --- Guardar dataset estructurado para el RAG, lote a lote ---
+            for rec in build_records(batch, pool):
+                out_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out_f.flush()
+            batch.clear()
+
+        def add(data: dict):
+            raw_f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            # --- NUEVO: construir registro estructurado para el RAG ---
+            batch.append((data, fetch_html(data)))
+            if len(batch) >= PAGE_BATCH_SIZE:
+                flush()
+
         for title in tqdm(WW2_TITLES, desc="Downloading Wikipedia pages"):
             data = fetch_page(title)
             if data:
-                f.write(json.dumps(data, ensure_ascii=False) + "\n")
                 # Expand linked pages for richer context
                 new_links = expand_links(data)
-
+                for link in new_links:
                     if link not in collected:
                         collected.add(link)
-                # --- NUEVO: construir registro estructurado para el RAG ---
-                # Intentar obtener HTML real de la página para limpieza
-                try:
-                    page_obj = wikipedia.page(data["title"], auto_suggest=False)
-                    html = page_obj.html()
-                except Exception:
-                    html = data.get("content", "")
-                url = data.get("url", None)
-                title_actual = data.get("title", None)
-                record = build_rag_record_from_page(title_actual, html, url=url)
-                structured_records.append(record)
-    print("[INFO] Downloading expanded linked pages...")
-    for title in tqdm(list(collected), desc="Linked pages"):
-        data = fetch_page(title)
-        if data:
-            with open(OUTPUT_PATH, "a", encoding="utf-8") as f:
-                f.write(json.dumps(data, ensure_ascii=False) + "\n")
-            # --- NUEVO: construir registro estructurado para el RAG ---
-            try:
-                page_obj = wikipedia.page(data["title"], auto_suggest=False)
-                html = page_obj.html()
-            except Exception:
-                html = data.get("content", "")
-            url = data.get("url", None)
-            title_actual = data.get("title", None)
-            record = build_rag_record_from_page(title_actual, html, url=url)
-            structured_records.append(record)
-    print(f"[OK] Saved pages to {OUTPUT_PATH}")
-
-    # --- Guardar dataset estructurado para el RAG ---
-    output_path = Path("data/processed_wikipedia_structured.jsonl")
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+                add(data)
+        flush()
 
-    with output_path.open("w", encoding="utf-8") as f:
-        for rec in structured_records:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        print("[INFO] Downloading expanded linked pages...")
+        for title in tqdm(list(collected), desc="Linked pages"):
+            data = fetch_page(title)
+            if data:
+                add(data)
+        flush()
 
-    print(f"[OK] Guardado dataset estructurado en {output_path}")
+    print(f"[OK] Saved pages to {OUTPUT_PATH}")
+    print(f"[OK] Guardado dataset estructurado en {STRUCTURED_PATH}")
 
 if __name__ == "__main__":
     wikipedia.set_lang("en")
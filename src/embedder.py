@@ -1,17 +1,140 @@
-from typing import List
+import hashlib
+import io
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, List, Optional
 
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 _MODEL_NAME = "BAAI/bge-small-en-v1.5"
 _model = None
 
+# Micro-batching de queries concurrentes: esperamos como mucho
+# QUERY_BATCH_MAX_WAIT_MS a que lleguen más, o hasta QUERY_BATCH_MAX_SIZE.
+QUERY_BATCH_MAX_WAIT_MS = 5
+QUERY_BATCH_MAX_SIZE = 32
+
+# Proyección PCA opcional (384 -> N dims) ajustada al indexar.
+PROJECTION_PATH = Path("data/projection.npz")
+# Las queries usan la proyección del índice publicado: su _meta guarda la ruta
+# y el sha1 del fichero. Se vuelve a mirar cada PROJECTION_CHECK_S para seguir
+# reindexados y rollbacks sin reiniciar el proceso. Quién es el índice publicado
+# lo sabe retriever/indexer, que registran la fuente con set_projection_source().
+PROJECTION_CHECK_S = 5.0
+_projection = None
+_projection_sha1 = None
+_projection_checked_at = float("-inf")
+_projection_refreshing = False
+_projection_lock = threading.Lock()
+_meta_source: Optional[Callable[[], dict]] = None
+
 def get_model() -> SentenceTransformer:
     global _model
     if _model is None:
         _model = SentenceTransformer(_MODEL_NAME)
     return _model
 
-def embed_documents(texts: List[str]) -> List[list]:
+def fit_projection(vectors: np.ndarray, dims: int) -> dict:
+    """
+    PCA sobre los embeddings del corpus: media + las `dims` direcciones principales.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    mean = vectors.mean(axis=0)
+    centered = vectors - mean
+    # Autovectores de la covarianza (d x d), más barato que SVD sobre n x d
+    eigvals, eigvecs = np.linalg.eigh(centered.T @ centered)
+    order = np.argsort(eigvals)[::-1][:dims]
+    components = eigvecs[:, order].T.astype(np.float32)
+    return {"mean": mean.astype(np.float32), "components": components}
+
+def project(vectors, projection: dict) -> np.ndarray:
+    """
+    Aplica la proyección y re-normaliza para seguir usando coseno.
+    """
+    reduced = (np.asarray(vectors, dtype=np.float32) - projection["mean"]) @ projection["components"].T
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.maximum(norms, 1e-12)
+
+def save_projection(projection: dict, path: Path = PROJECTION_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, mean=projection["mean"], components=projection["components"])
+
+def set_projection_source(source: Callable[[], dict]):
+    """
+    source() -> _meta del índice al que apunta el alias (lanza si ES no responde).
+    """
+    global _meta_source, _projection_checked_at
+    with _projection_lock:
+        _meta_source = source
+        _projection_checked_at = float("-inf")
+
+def load_projection(path: Path, sha1: Optional[str] = None) -> dict:
+    data = Path(path).read_bytes()
+    if sha1 and hashlib.sha1(data).hexdigest() != sha1:
+        raise ValueError(f"Projection file {path} does not match the live index (sha1 {sha1})")
+    arrays = np.load(io.BytesIO(data))
+    return {"mean": arrays["mean"], "components": arrays["components"]}
+
+def _read_meta(source: Callable[[], dict]) -> Optional[dict]:
+    try:
+        return source()
+    except Exception:
+        # Sin ES seguimos con la última conocida
+        return None
+
+def _apply_meta(meta: Optional[dict]):
+    # Llamar con _projection_lock
+    global _projection, _projection_sha1
+    if meta is None:
+        return
+    sha1 = meta.get("projection_sha1")
+    if sha1 != _projection_sha1:
+        path = meta.get("projection")
+        _projection = load_projection(Path(path), sha1) if path else None
+        _projection_sha1 = sha1
+        print(f"[INFO] Query projection: {path or 'none'}")
+
+def get_projection() -> Optional[dict]:
+    """
+    Proyección con la que se construyó el índice publicado, o None.
+    """
+    global _projection_checked_at, _projection_refreshing
+    with _projection_lock:
+        if _meta_source is None:
+            return _projection
+        now = time.monotonic()
+        # El reloj avanza también si ES falla, para no reintentar en cada embedding
+        if _projection_checked_at == float("-inf"):
+            # Primera vez: sin la proyección los vectores no sirven, todos esperan
+            _projection_checked_at = now
+            _apply_meta(_read_meta(_meta_source))
+            return _projection
+        if now - _projection_checked_at < PROJECTION_CHECK_S or _projection_refreshing:
+            return _projection
+        # Después, un solo hilo mira ES y fuera del lock: el resto sigue con la conocida
+        _projection_checked_at = now
+        _projection_refreshing = True
+        source = _meta_source
+
+    meta = _read_meta(source)
+    with _projection_lock:
+        try:
+            _apply_meta(meta)
+        finally:
+            _projection_refreshing = False
+        return _projection
+
+def _maybe_project(embeddings: np.ndarray, reduce: bool) -> List[list]:
+    projection = get_projection() if reduce else None
+    if projection is not None:
+        embeddings = project(embeddings, projection)
+    return embeddings.tolist()
+
+def embed_documents(texts: List[str], reduce: bool = True) -> List[list]:
     """
     Embeddings para documentos/pasajes.
     BGE recomienda prefijo 'passage: '.
@@ -19,17 +142,95 @@ def embed_documents(texts: List[str]) -> List[list]:
     model = get_model()
     to_encode = [f"passage: {t}" for t in texts]
     embeddings = model.encode(to_encode, normalize_embeddings=True)
-    return embeddings.tolist()
+    return _maybe_project(embeddings, reduce)
+
+def embed_queries(texts: List[str], reduce: bool = True) -> List[list]:
+    """
+    Embeddings para varias queries en un solo forward.
+    BGE recomienda prefijo 'query: '.
+    """
+    model = get_model()
+    to_encode = [f"query: {t}" for t in texts]
+    embeddings = model.encode(to_encode, normalize_embeddings=True)
+    return _maybe_project(embeddings, reduce)
+
+
+class QueryBatcher:
+    """
+    Agrupa llamadas concurrentes a embed_query en un único model.encode.
+    Cada llamante recibe su propio vector.
+    """
+
+    def __init__(self, max_wait_ms: float = QUERY_BATCH_MAX_WAIT_MS,
+                 max_batch_size: int = QUERY_BATCH_MAX_SIZE):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_sizes: Counter = Counter()
+        self._cond = threading.Condition()
+        self._pending: list[tuple[str, Future]] = []
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="query-batcher")
+        self._thread.start()
+
+    def embed(self, text: str) -> list:
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future.result()
+
+    def histogram(self) -> dict:
+        """
+        {tamaño de batch: nº de batches} desde el arranque.
+        """
+        with self._cond:
+            return dict(sorted(self.batch_sizes.items()))
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Ventana de recogida desde la primera petición
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[: self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size :]
+                self.batch_sizes[len(batch)] += 1
+
+            texts = [t for t, _ in batch]
+            try:
+                vectors = embed_queries(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vec in zip(batch, vectors):
+                future.set_result(vec)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_query_batcher() -> QueryBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = QueryBatcher()
+    return _batcher
 
 def embed_query(text: str) -> list:
     """
     Embedding para queries.
     BGE recomienda prefijo 'query: '.
+    Pasa por el micro-batcher para compartir forward con queries concurrentes.
     """
-    model = get_model()
-    emb = model.encode([f"query: {text}"], normalize_embeddings=True)[0]
-    return emb.tolist()
+    return get_query_batcher().embed(text)
 
 if __name__ == "__main__":
     vec = embed_query("What caused World War II?")
-    print(f"Embedding dims: {len(vec)}")
\ No newline at end of file
+    print(f"Embedding dims: {len(vec)}")
+    print(f"Batch sizes: {get_query_batcher().histogram()}")
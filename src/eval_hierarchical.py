@@ -0,0 +1,87 @@
+# src/eval_hierarchical.py
+#
+# Compara la búsqueda plana (kNN sobre todos los chunks) con la jerárquica
+# (artículos primero, chunks después) frente a la fuerza bruta exacta.
+#
+#   python -m src.eval_hierarchical --queries 200 --k 5
+
+import argparse
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from src.embedder import embed_queries
+from src.retriever import (
+    INDEX_NAME, build_exact_search_body, get_es_client, parse_hits, search_vector,
+)
+
+DATA_PATH = Path("data/processed_wikipedia_structured.jsonl")
+TOP_ARTICLES_SWEEP = [2, 4, 8, 16, 32]
+
+
+def sample_queries(n: int, seed: int = 0) -> list[str]:
+    """
+    Usa los key_points generados por el LLM como preguntas de prueba:
+    son frases cortas y factuales, parecidas a lo que pregunta un usuario.
+    """
+    points = []
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            points.extend(p for p in rec.get("key_points", []) if isinstance(p, str) and p.strip())
+    random.Random(seed).shuffle(points)
+    return points[:n]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _p95(values: list[float]) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=20)[-1]
+
+
+def evaluate(n_queries: int = 200, k: int = 5):
+    client = get_es_client()
+    queries = sample_queries(n_queries)
+    if not queries:
+        print(f"[WARN] No key_points found in {DATA_PATH}")
+        return
+    vectors = embed_queries(queries)
+
+    print(f"[INFO] Ground truth: exact cosine top-{k} for {len(queries)} queries...")
+    truth = []
+    for vec in vectors:
+        resp = client.search(index=INDEX_NAME, body=build_exact_search_body(vec, k=k))
+        truth.append({h["id"] for h in parse_hits(resp)})
+
+    configs = [("flat", None)] + [("hierarchical", n) for n in TOP_ARTICLES_SWEEP]
+    print(f"\n{'mode':<14}{'articles':>9}{'recall@' + str(k):>11}{'mean ms':>10}{'p95 ms':>9}")
+    for mode, top_articles in configs:
+        recalls, latencies = [], []
+        for vec, expected in zip(vectors, truth):
+            hits, ms = _timed(lambda: search_vector(
+                client, vec, k=k, mode=mode, top_articles=top_articles or 0, diversify=False,
+            ))
+            latencies.append(ms)
+            if expected:
+                recalls.append(len(expected & {h["id"] for h in hits}) / len(expected))
+        print(
+            f"{mode:<14}{top_articles or '-':>9}"
+            f"{statistics.mean(recalls) if recalls else 0.0:>11.3f}"
+            f"{statistics.mean(latencies):>10.1f}{_p95(latencies):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flat vs hierarchical retrieval evaluation")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    evaluate(args.queries, args.k)
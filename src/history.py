@@ -0,0 +1,85 @@
+import json
+import time
+from collections import deque
+from pathlib import Path
+
+# Mensajes que cada sesión mantiene en memoria (y que se pintan en cada rerun)
+HISTORY_WINDOW = 20
+# Mensajes antiguos que se cargan cada vez que se pide "ver anteriores"
+HISTORY_PAGE_SIZE = 20
+SESSIONS_DIR = Path("data/sessions")
+# Ficheros de sesión sin tocar desde hace más de esto se borran (contenido del usuario)
+SESSION_MAX_AGE_H = 24
+
+
+def prune_sessions(max_age_h: float = SESSION_MAX_AGE_H, directory: Path = SESSIONS_DIR) -> int:
+    """
+    Borra los historiales volcados de sesiones inactivas. Devuelve cuántos.
+    """
+    cutoff = time.time() - max_age_h * 3600
+    removed = 0
+    for path in directory.glob("*.jsonl"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+class ChatHistory:
+    """
+    Historial de chat acotado: los últimos `window` mensajes en memoria y el
+    resto volcado a data/sessions/<session_id>.jsonl, que se lee por páginas.
+    Así el coste de cada rerun no crece con la conversación.
+    """
+
+    def __init__(self, session_id: str, window: int = HISTORY_WINDOW,
+                 directory: Path = SESSIONS_DIR):
+        self.window = max(1, window)
+        self.path = directory / f"{session_id}.jsonl"
+        self.recent: deque[dict] = deque()
+        # Offset en bytes de cada mensaje volcado, para leer páginas con seek
+        self._offsets: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self.recent)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._offsets)
+
+    def append(self, message: dict):
+        self.recent.append(message)
+        if len(self.recent) > self.window:
+            self._spill(self.recent.popleft())
+
+    def _spill(self, message: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._offsets and not self.path.exists():
+            # prune_sessions() borró el fichero de una sesión inactiva
+            self._offsets.clear()
+        with self.path.open("ab") as f:
+            self._offsets.append(f.tell())
+            f.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def older(self, count: int) -> list[dict]:
+        """
+        Los `count` mensajes volcados más recientes, en orden cronológico.
+        """
+        count = min(count, self.spilled)
+        if count <= 0:
+            return []
+        try:
+            with self.path.open("rb") as f:
+                f.seek(self._offsets[self.spilled - count])
+                return [json.loads(line) for line in f.read().splitlines()]
+        except FileNotFoundError:
+            self._offsets.clear()
+            return []
+
+    def clear(self):
+        self.recent.clear()
+        self._offsets.clear()
+        self.path.unlink(missing_ok=True)
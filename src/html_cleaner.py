@@ -0,0 +1,103 @@
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor
+from html.parser import HTMLParser
+
+# Mismas secciones que corta clean_wikipedia_content, buscadas en una sola pasada
+CUTOFF_SECTIONS = ["See also", "References", "Further reading", "External links", "Bibliography", "Notas", "Referencias"]
+_CUTOFF = re.compile("|".join(re.escape(s) for s in CUTOFF_SECTIONS), re.IGNORECASE)
+_NEWLINES = re.compile(r"\n+")
+
+# Subárboles que no aportan contexto histórico (equivale a "table, sup, .reference, .toc")
+_SKIP_TAGS = {"table", "sup"}
+_SKIP_CLASSES = {"reference", "toc"}
+# Su texto tampoco lo devuelve BeautifulSoup.get_text()
+_INVISIBLE_TAGS = {"script", "style", "template"}
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+# Por debajo de esto no compensa arrancar procesos
+MIN_PAGES_FOR_POOL = 8
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Recorre el HTML una sola vez, saltándose los subárboles descartados
+    mientras se parsea (sin construir el árbol completo como BeautifulSoup).
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: list[str] = []
+        self._skip_stack: list[str] = []
+        self._in_data = False
+
+    def handle_starttag(self, tag, attrs):
+        self._in_data = False
+        if tag in _VOID_TAGS:
+            return
+        if self._skip_stack:
+            self._skip_stack.append(tag)
+            return
+        if tag in _SKIP_TAGS or tag in _INVISIBLE_TAGS:
+            self._skip_stack.append(tag)
+            return
+        for name, value in attrs:
+            if name == "class" and value and _SKIP_CLASSES.intersection(value.split()):
+                self._skip_stack.append(tag)
+                return
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <img/>...: no abren subárbol
+        self._in_data = False
+
+    def handle_endtag(self, tag):
+        self._in_data = False
+        if tag in self._skip_stack:
+            # Cierra también los hijos que el HTML dejó sin cerrar
+            while self._skip_stack.pop() != tag:
+                pass
+
+    def handle_data(self, data):
+        if self._skip_stack:
+            return
+        if self._in_data:
+            self.pieces[-1] += data
+        else:
+            self.pieces.append(data)
+            self._in_data = True
+
+    def handle_comment(self, data):
+        self._in_data = False
+
+
+def clean_html(html: str) -> str:
+    """
+    Versión rápida de clean_wikipedia_content: mismo resultado, una sola pasada
+    por el HTML y una sola búsqueda de las secciones de corte.
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+
+    text = _NEWLINES.sub("\n", "\n".join(parser.pieces)).strip()
+
+    match = _CUTOFF.search(text)
+    if match:
+        text = text[: match.start()].strip()
+    return text
+
+
+def clean_many(htmls: list[str], workers: int | None = None,
+               pool: Executor | None = None) -> list[str]:
+    """
+    Limpia muchas páginas repartiéndolas en un pool de procesos. Quien limpia
+    por lotes debe pasar su propio `pool` para no arrancar procesos en cada lote.
+    """
+    if pool is not None:
+        return list(pool.map(clean_html, htmls, chunksize=4))
+    if workers == 1 or len(htmls) < MIN_PAGES_FOR_POOL:
+        return [clean_html(h) for h in htmls]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(clean_html, htmls, chunksize=4))
@@ -1,20 +1,55 @@
+import argparse
+import hashlib
 import json
+import re
+import time
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Optional
 
+import numpy as np
 from elasticsearch import Elasticsearch, helpers
 from tqdm import tqdm
 
-from embedder import embed_documents
+from embedder import (
+    _MODEL_NAME, PROJECTION_PATH, embed_documents, fit_projection, project, save_projection,
+    set_projection_source,
+)
 from chunker import chunk_text
+from dedup import DEDUP_THRESHOLD, MinHashDeduplicator
 
 
 DATA_PATH = Path("data/processed_wikipedia_structured.jsonl")
+# Alias de lectura: cada reindexado crea índices físicos nuevos (<alias>_v<versión>)
+# y al terminar mueve los alias a ellos de forma atómica.
 INDEX_NAME = "ww2_wiki"
+# Un documento por artículo (topic + summary + key_points) para la búsqueda jerárquica
+ARTICLE_INDEX_NAME = "ww2_articles"
+ALIASES = [INDEX_NAME, ARTICLE_INDEX_NAME]
+
+# Shards primarios por índice: más de 1 solo compensa con varios nodos ES
+NUMBER_OF_SHARDS = 1
+# Réplicas al publicar (durante la carga siempre 0). El docker-compose es de un nodo.
+NUMBER_OF_REPLICAS = 0
+# Versiones físicas que se conservan por alias (la publicada + las de rollback)
+KEEP_VERSIONS = 2
+# Búsquedas kNN para calentar el índice nuevo antes de publicarlo
+WARMUP_QUERIES = 20
 
 # BGE-small -> 384 dims
 EMBEDDING_DIMS = 384
 
+# Reducción opcional con PCA ajustada sobre los embeddings del corpus
+# (p.ej. 128). None = vectores completos. Ver src/reduction_report.py.
+REDUCED_DIMS = None
+
+# Grafo HNSW del campo embedding (valores por defecto de ES). Ver src/ann_tuner.py.
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 100
+
+# Parámetros del chunker (forman parte de la versión de un snapshot)
+CHUNK_MAX_CHARS = 900
+CHUNK_OVERLAP = 150
+
 def get_es_client():
     return Elasticsearch(
         ["http://localhost:9200"],
@@ -22,116 +57,459 @@ def get_es_client():
         ssl_show_warn=False
     )
 
-def create_index(client: Elasticsearch):
-    # HEAD /index is buggy in ES 8.14 → causes 400
-    try:
-        client.indices.get(index=INDEX_NAME)
-        print(f"[INFO] Index '{INDEX_NAME}' already exists, skipping create.")
-        return
-    except Exception:
-        # Index does not exist → create it
-        pass
-
-    mapping = {
-        "mappings": {
-            "properties": {
-                "topic": {"type": "text"},
-                "summary": {"type": "text"},
-                "key_points": {"type": "text"},
-                "locations": {"type": "text"},
-                "people": {"type": "text"},
-                "date": {"type": "text"},
-                "raw_text": {"type": "text"},
-                "source": {"type": "text"},
-                "url": {"type": "text"},
-                "chunk_id": {"type": "integer"},
-                "embedding": {
-                    "type": "dense_vector",
-                    "dims": EMBEDDING_DIMS
-                },
-            }
+_NORMALIZER_SETTINGS = {
+    "analysis": {
+        "normalizer": {
+            # Filtros exactos sin depender de mayúsculas/acentos
+            "folded": {"type": "custom", "filter": ["lowercase", "asciifolding"]}
         }
     }
+}
 
-    client.indices.create(index=INDEX_NAME, body=mapping)
-    print(f"[OK] Index '{INDEX_NAME}' created.")
+def index_dims() -> int:
+    return REDUCED_DIMS or EMBEDDING_DIMS
 
-def iter_documents() -> Iterable[dict]:
+def projection_path(version: str) -> Path:
     """
-    Yields docs ready to be embedded/indexed from processed_wikipedia_structured.jsonl
+    Cada versión del índice tiene su propio fichero de proyección.
+    """
+    return PROJECTION_PATH.with_name(f"projection_{version}.npz")
+
+def index_meta(projection_file: Optional[Path] = None) -> dict:
+    """
+    Se guarda en el _meta del mapping: con qué se construyeron los vectores.
+    embedder.get_projection() lo lee del índice publicado. `published` pasa a
+    True al mover el alias; las versiones a medias se quedan en False.
+    """
+    meta = {"embedding_model": _MODEL_NAME, "embedding_dims": index_dims(),
+            "projection": None, "published": False}
+    if projection_file is not None:
+        meta["projection"] = str(projection_file)
+        meta["projection_sha1"] = hashlib.sha1(projection_file.read_bytes()).hexdigest()
+    return meta
+
+def embedding_mapping(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION) -> dict:
+    return {
+        "type": "dense_vector",
+        "dims": index_dims(),
+        "index": True,
+        "similarity": "cosine",
+        "index_options": {"type": "hnsw", "m": m, "ef_construction": ef_construction},
+    }
+
+def _metadata_properties() -> dict:
+    """
+    Campos compartidos por el índice de chunks y el de artículos.
+    """
+    return {
+        "article_id": {"type": "keyword"},
+        "topic": {"type": "text"},
+        "summary": {"type": "text"},
+        "key_points": {"type": "text"},
+        "locations": {
+            "type": "keyword",
+            "normalizer": "folded",
+            "fields": {"text": {"type": "text"}},
+        },
+        "people": {
+            "type": "keyword",
+            "normalizer": "folded",
+            "fields": {"text": {"type": "text"}},
+        },
+        "date": {"type": "text"},
+        # Rango de años extraído de `date` para filtrar por periodo
+        "years": {"type": "integer_range"},
+        "source": {"type": "text"},
+        "url": {"type": "text"},
+        "embedding": embedding_mapping(),
+    }
+
+def _index_body(properties: dict, shards: int, meta: dict) -> dict:
+    return {
+        "settings": {
+            **_NORMALIZER_SETTINGS,
+            "number_of_shards": shards,
+            # Carga masiva: sin réplicas ni refrescos hasta publicar
+            "number_of_replicas": 0,
+            "refresh_interval": "-1",
+        },
+        "mappings": {"_meta": meta, "properties": properties},
+    }
+
+def create_index(client: Elasticsearch, index_name: str, shards: int = NUMBER_OF_SHARDS,
+                 projection_file: Optional[Path] = None):
+    properties = _metadata_properties()
+    properties.update({
+        "raw_text": {"type": "text"},
+        "chunk_id": {"type": "integer"},
+    })
+    client.indices.create(index=index_name, body=_index_body(properties, shards, index_meta(projection_file)))
+    print(f"[OK] Index '{index_name}' created.")
+
+def create_article_index(client: Elasticsearch, index_name: str, shards: int = NUMBER_OF_SHARDS,
+                         projection_file: Optional[Path] = None):
+    body = _index_body(_metadata_properties(), shards, index_meta(projection_file))
+    client.indices.create(index=index_name, body=body)
+    print(f"[OK] Index '{index_name}' created.")
+
+# --- Versiones y alias ---
+
+def new_version() -> str:
+    return time.strftime("%Y%m%d%H%M%S")
+
+def versioned_name(alias: str, version: str) -> str:
+    return f"{alias}_v{version}"
+
+def _is_published(info: dict) -> bool:
+    # Índices creados antes de existir la marca cuentan como publicados
+    return info.get("mappings", {}).get("_meta", {}).get("published", True)
+
+def list_versions(client: Elasticsearch, alias: str, published_only: bool = False) -> list[str]:
+    """
+    Versiones físicas existentes de un alias, de la más antigua a la más nueva.
+    """
+    prefix = f"{alias}_v"
+    indices = client.indices.get(index=f"{prefix}*", ignore_unavailable=True, allow_no_indices=True)
+    return sorted(
+        name[len(prefix):] for name, info in indices.items()
+        if not published_only or _is_published(info)
+    )
+
+def existing_indices(client: Elasticsearch, names: Iterable[str]) -> set[str]:
+    """
+    Cuáles de esos índices físicos existen. Sin indices.exists(): HEAD /index
+    da 400 en ES 8.14.
+    """
+    found = client.indices.get(index=",".join(names), ignore_unavailable=True, allow_no_indices=True)
+    return set(found)
+
+def current_index(client: Elasticsearch, alias: str) -> Optional[str]:
+    """
+    Índice físico al que apunta el alias (None si todavía no hay alias).
+    """
+    try:
+        return next(iter(client.indices.get_alias(name=alias)), None)
+    except Exception:
+        return None
+
+def live_version(client: Elasticsearch) -> Optional[str]:
+    live = current_index(client, INDEX_NAME) or ""
+    prefix = f"{INDEX_NAME}_v"
+    return live[len(prefix):] if live.startswith(prefix) else None
+
+def get_meta(client: Elasticsearch, index_name: str) -> dict:
+    """
+    _meta del mapping de un índice (o del índice al que apunta un alias).
+    """
+    resp = client.indices.get_mapping(index=index_name)
+    return next(iter(resp.values()))["mappings"].get("_meta", {})
+
+# Las herramientas que embeben queries (ann_tuner, reduction_report) usan la
+# proyección del índice publicado
+set_projection_source(
+    lambda: get_meta(get_es_client().options(request_timeout=2, max_retries=0), INDEX_NAME)
+)
+
+def finalize_index(client: Elasticsearch, index_name: str, replicas: int = NUMBER_OF_REPLICAS):
+    """
+    Deja el índice listo para servir: refresco normal, réplicas, un segmento
+    (un solo grafo HNSW por shard) y shards asignados.
+    """
+    client.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": None}})
+    client.indices.refresh(index=index_name)
+    # Antes de añadir réplicas, para que copien el segmento ya fusionado
+    client.options(request_timeout=1800).indices.forcemerge(
+        index=index_name, max_num_segments=1, wait_for_completion=True,
+    )
+    client.indices.put_settings(index=index_name, settings={"index": {"number_of_replicas": replicas}})
+    client.options(request_timeout=300).cluster.health(
+        index=index_name, wait_for_status="green" if replicas else "yellow", timeout="5m",
+    )
+
+def warm_index(client: Elasticsearch, index_name: str, n_queries: int = WARMUP_QUERIES):
+    """
+    Lanza kNN con vectores del propio índice para cargar los grafos HNSW
+    en memoria antes de recibir tráfico.
+    """
+    resp = client.search(index=index_name, size=n_queries, source=["embedding"],
+                         query={"function_score": {"random_score": {}}})
+    for hit in resp["hits"]["hits"]:
+        client.search(index=index_name, size=10, source=False, knn={
+            "field": "embedding",
+            "query_vector": hit["_source"]["embedding"],
+            "k": 10,
+            "num_candidates": 100,
+        })
+
+def swap_aliases(client: Elasticsearch, targets: dict[str, str]):
+    """
+    Mueve todos los alias a sus nuevos índices en una sola operación atómica:
+    las búsquedas ven la versión anterior o la nueva, nunca un hueco.
+    """
+    actions = []
+    for alias, index_name in targets.items():
+        previous = current_index(client, alias)
+        if previous is None and alias in existing_indices(client, [alias]):
+            # Índice antiguo sin versionar con el nombre del alias: se sustituye
+            print(f"[WARN] '{alias}' is an unversioned index; it is replaced and cannot be rolled back to.")
+            actions.append({"remove_index": {"index": alias}})
+        elif previous and previous != index_name:
+            actions.append({"remove": {"index": previous, "alias": alias}})
+        actions.append({"add": {"index": index_name, "alias": alias}})
+    client.indices.update_aliases(actions=actions)
+    for alias, index_name in targets.items():
+        print(f"[OK] Alias '{alias}' -> '{index_name}'")
+
+def mark_published(client: Elasticsearch, indices: dict[str, str]):
+    for index_name in indices.values():
+        client.indices.put_mapping(index=index_name, meta={**get_meta(client, index_name), "published": True})
+
+def delete_version(client: Elasticsearch, version: str):
+    for alias in ALIASES:
+        client.indices.delete(index=versioned_name(alias, version), ignore_unavailable=True)
+    projection_path(version).unlink(missing_ok=True)
+    print(f"[INFO] Deleted index version {version}")
+
+def prune_versions(client: Elasticsearch, keep: int = KEEP_VERSIONS):
+    """
+    Conserva las `keep` últimas versiones publicadas (y siempre la viva) y
+    borra las que quedaron a medias antes de la viva.
+    """
+    live = live_version(client)
+    published = list_versions(client, INDEX_NAME, published_only=True)
+    existing = set(list_versions(client, INDEX_NAME)) | set(list_versions(client, ARTICLE_INDEX_NAME))
+    stale = set(published[:-keep])
+    # Más nuevas que la viva pueden ser un build en curso: no se tocan
+    orphans = {v for v in existing - set(published) if live and v < live}
+    for version in sorted(stale | orphans):
+        if version != live:
+            delete_version(client, version)
+
+def build_version(client: Elasticsearch, load: Callable[[dict[str, str]], None],
+                  shards: int = NUMBER_OF_SHARDS, replicas: int = NUMBER_OF_REPLICAS,
+                  projection: Optional[dict] = None) -> dict[str, str]:
+    """
+    Crea una versión nueva, la llena con load({alias: índice}), la prepara y
+    mueve los alias. Si algo falla antes del cambio de alias se borra entera,
+    así no quedan índices a medias que cuenten como versiones.
+    """
+    version = new_version()
+    indices = {alias: versioned_name(alias, version) for alias in ALIASES}
+    try:
+        projection_file = None
+        if projection is not None:
+            projection_file = projection_path(version)
+            save_projection(projection, projection_file)
+        create_index(client, indices[INDEX_NAME], shards, projection_file)
+        create_article_index(client, indices[ARTICLE_INDEX_NAME], shards, projection_file)
+        load(indices)
+        for index_name in indices.values():
+            finalize_index(client, index_name, replicas)
+            warm_index(client, index_name)
+    except BaseException:
+        print(f"[ERROR] Building version {version} failed; removing it.")
+        delete_version(client, version)
+        raise
+
+    swap_aliases(client, indices)
+    mark_published(client, indices)
+    prune_versions(client)
+    return indices
+
+def rollback(client: Elasticsearch):
+    """
+    Vuelve a publicar la versión publicada anterior a la actual. Su proyección
+    viaja en el _meta, así que las queries la recogen solas.
+    """
+    live = live_version(client) or ""
+    older = [v for v in list_versions(client, INDEX_NAME, published_only=True) if v < live]
+    if not older:
+        raise ValueError("No previous version to roll back to")
+    version = older[-1]
+    targets = {alias: versioned_name(alias, version) for alias in ALIASES}
+    found = existing_indices(client, targets.values())
+    missing = [name for name in targets.values() if name not in found]
+    if missing:
+        raise ValueError(f"Previous version {version} is incomplete (missing {missing})")
+
+    projection = get_meta(client, targets[INDEX_NAME]).get("projection")
+    if projection and not Path(projection).exists():
+        raise ValueError(f"Projection file {projection} of version {version} is missing on this node")
+    swap_aliases(client, targets)
+
+def print_status(client: Elasticsearch):
+    published = set(list_versions(client, INDEX_NAME, published_only=True))
+    for alias in ALIASES:
+        live = current_index(client, alias)
+        print(f"{alias}:")
+        for version in list_versions(client, alias):
+            name = versioned_name(alias, version)
+            note = "" if version in published else "  (never published)"
+            print(f"  {'*' if name == live else ' '} {name}{note}")
+
+# Fechas completas: '1944-06-06', '1939/09/01' (solo interesa el año)
+_ISO_DATE = re.compile(r"\b(1[89]\d{2}|20\d{2})[-/](\d{1,2})[-/](\d{1,2})\b")
+# '1939–45', '1945-47'; no '1944-06-06' (le sigue otro grupo) ni '1944-06' (06 < 44)
+_YEAR_RANGE_SHORT = re.compile(r"\b(1[89]\d{2}|20\d{2})\s*[-–/]\s*(\d{2})\b(?!\s*[-–/]\s*\d)")
+_YEAR = re.compile(r"\b(1[89]\d{2}|20\d{2})\b")
+
+def _expand_short_range(m: re.Match) -> str:
+    first = m.group(1)
+    second = f"{first[:2]}{m.group(2)}"
+    if int(second) < int(first):
+        return m.group(0)
+    return f"{first} {second}"
+
+def parse_date_range(date: str) -> Optional[dict]:
+    """
+    Convierte el `date` libre que genera el LLM ('June 1944', '1945-1947',
+    '1939–45', '7 December 1941', '1944-06-06') en un integer_range
+    {"gte", "lte"} de años.
+    """
+    if not date:
+        return None
+
+    text = _ISO_DATE.sub(lambda m: m.group(1), str(date))
+    # '1939–45' -> 1939, 1945
+    text = _YEAR_RANGE_SHORT.sub(_expand_short_range, text)
+    years = [int(y) for y in _YEAR.findall(text)]
+    if not years:
+        return None
+    return {"gte": min(years), "lte": max(years)}
+
+def _clean_list(values) -> list[str]:
+    if isinstance(values, str):
+        values = values.split(",")
+    return [v.strip() for v in values or [] if isinstance(v, str) and v.strip()]
+
+def iter_records() -> Iterable[dict]:
+    """
+    Registros estructurados (uno por artículo) de processed_wikipedia_structured.jsonl
     """
     with open(DATA_PATH, "r", encoding="utf-8") as f:
         for line in f:
-            rec = json.loads(line)
-
-            topic = rec.get("topic", "")
-            summary = rec.get("summary", "")
-            key_points = rec.get("key_points", [])
-            locations = rec.get("locations", [])
-            people = rec.get("people", [])
-            date = rec.get("date", "")
-            raw_text = rec.get("raw_text", "")
-            source = rec.get("source", "wikipedia")
-            url = rec.get("url", "")
-
-            chunks = chunk_text(raw_text, max_chars=900, overlap=150)
-
-            for i, chunk in enumerate(chunks):
-                yield {
-                    "topic": topic,
-                    "summary": summary,
-                    "key_points": ", ".join(key_points),
-                    "locations": ", ".join(locations),
-                    "people": ", ".join(people),
-                    "date": date,
-                    "raw_text": chunk,
-                    "source": source,
-                    "url": url,
-                    "chunk_id": i,
-                }
-
-def bulk_index():
-    client = get_es_client()
-    create_index(client)
+            yield json.loads(line)
 
-    docs = list(iter_documents())
-    print(f"[INFO] Total chunks to index: {len(docs)}")
+def _article_metadata(rec: dict) -> dict:
+    topic = rec.get("topic", "")
+    url = rec.get("url", "") or ""
+    date = rec.get("date", "") or ""
+    return {
+        # La URL identifica el artículo; si falta, el topic
+        "article_id": url or topic,
+        "topic": topic,
+        "summary": rec.get("summary", ""),
+        "key_points": ", ".join(rec.get("key_points", [])),
+        "locations": _clean_list(rec.get("locations", [])),
+        "people": _clean_list(rec.get("people", [])),
+        "date": date,
+        "years": parse_date_range(date),
+        "source": rec.get("source", "wikipedia"),
+        "url": url,
+    }
+
+def iter_documents(dedup_threshold: Optional[float] = DEDUP_THRESHOLD) -> Iterable[dict]:
+    """
+    Yields docs ready to be embedded/indexed from processed_wikipedia_structured.jsonl
 
+    Con dedup_threshold, se descartan chunks casi idénticos a otros ya vistos
+    (artículos solapados del crawler, secciones copiadas entre páginas...).
+    """
+    dedup = MinHashDeduplicator(dedup_threshold) if dedup_threshold else None
+
+    for rec in iter_records():
+        meta = _article_metadata(rec)
+        chunks = chunk_text(rec.get("raw_text", ""), max_chars=CHUNK_MAX_CHARS, overlap=CHUNK_OVERLAP)
+
+        for i, chunk in enumerate(chunks):
+            if dedup is not None and dedup.is_duplicate(chunk):
+                continue
+            yield {**meta, "raw_text": chunk, "chunk_id": i}
+
+    if dedup is not None:
+        print(f"[INFO] Dropped {dedup.dropped} near-duplicate chunks (threshold={dedup_threshold})")
+
+def article_text(rec: dict) -> str:
+    """
+    Texto que representa al artículo entero en el índice de artículos.
+    """
+    key_points = "\n".join(f"- {p}" for p in rec.get("key_points", []))
+    return f"{rec.get('topic', '')}\n{rec.get('summary', '')}\n{key_points}".strip()
+
+def iter_articles() -> Iterable[tuple[dict, str]]:
+    """
+    Yields (doc, texto a embeber) por artículo.
+    """
+    for rec in iter_records():
+        yield _article_metadata(rec), article_text(rec)
+
+def embed_all(texts: list[str], desc: str) -> np.ndarray:
+    """
+    Embeddings completos (sin proyección) de todo el corpus.
+    """
     # Embed in batches to not blow up memory
     batch_size = 64
-    actions = []
-    for i in tqdm(range(0, len(docs), batch_size), desc="Indexing batches"):
-        batch = docs[i : i + batch_size]
-        texts = [d["raw_text"] for d in batch]
-        embeddings = embed_documents(texts)
-
-        for doc, emb in zip(batch, embeddings):
-            action = {
-                "_index": INDEX_NAME,
-                "_source": {
-                    "topic": doc["topic"],
-                    "summary": doc["summary"],
-                    "key_points": doc["key_points"],
-                    "locations": doc["locations"],
-                    "people": doc["people"],
-                    "date": doc["date"],
-                    "raw_text": doc["raw_text"],
-                    "source": doc["source"],
-                    "url": doc["url"],
-                    "chunk_id": doc["chunk_id"],
-                    "embedding": emb,
-                },
-            }
-            actions.append(action)
-
-        if len(actions) >= batch_size:
-            helpers.bulk(client, actions)
-            actions = []
-
-    if actions:
+    vectors = np.zeros((len(texts), EMBEDDING_DIMS), dtype=np.float32)
+    for i in tqdm(range(0, len(texts), batch_size), desc=desc):
+        vectors[i : i + batch_size] = embed_documents(texts[i : i + batch_size], reduce=False)
+    return vectors
+
+def index_vectors(client: Elasticsearch, index_name: str,
+                  docs: list[dict], vectors: np.ndarray):
+    batch_size = 500
+    for i in range(0, len(docs), batch_size):
+        actions = [
+            {"_index": index_name, "_source": {**doc, "embedding": vec.tolist()}}
+            for doc, vec in zip(docs[i : i + batch_size], vectors[i : i + batch_size])
+        ]
         helpers.bulk(client, actions)
 
+def bulk_index(shards: int = NUMBER_OF_SHARDS, replicas: int = NUMBER_OF_REPLICAS):
+    """
+    Reindexa en una versión nueva mientras la actual sigue sirviendo y solo
+    al final mueve los alias.
+    """
+    client = get_es_client()
+
+    docs = list(iter_documents())
+    print(f"[INFO] Total chunks to index: {len(docs)}")
+    chunk_vectors = embed_all([d["raw_text"] for d in docs], desc="Embedding chunks")
+
+    articles = list(iter_articles())
+    print(f"[INFO] Total articles to index: {len(articles)}")
+    article_vectors = embed_all([t for _, t in articles], desc="Embedding articles")
+
+    projection = None
+    if REDUCED_DIMS:
+        # La misma proyección se aplica luego en embed_query
+        projection = fit_projection(chunk_vectors, REDUCED_DIMS)
+        chunk_vectors = project(chunk_vectors, projection)
+        article_vectors = project(article_vectors, projection)
+        print(f"[INFO] Reduced embeddings {EMBEDDING_DIMS} -> {REDUCED_DIMS} dims")
+
+    def load(indices: dict[str, str]):
+        index_vectors(client, indices[INDEX_NAME], docs, chunk_vectors)
+        index_vectors(client, indices[ARTICLE_INDEX_NAME], [a for a, _ in articles], article_vectors)
+
+    build_version(client, load, shards, replicas, projection)
+
     print("[OK] Indexing completed.")
 
 if __name__ == "__main__":
-    bulk_index()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build a new index version and publish it behind the aliases")
+    parser.add_argument("--shards", type=int, default=NUMBER_OF_SHARDS)
+    parser.add_argument("--replicas", type=int, default=NUMBER_OF_REPLICAS)
+    parser.add_argument("--rollback", action="store_true", help="Point the aliases back to the previous version")
+    parser.add_argument("--status", action="store_true", help="List index versions and the live one")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            print_status(get_es_client())
+        elif args.rollback:
+            rollback(get_es_client())
+        else:
+            bulk_index(args.shards, args.replicas)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        raise SystemExit(1)
@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Modelos del selector de la barra lateral
+AVAILABLE_MODELS = ["qwen2.5:7b-instruct", "deepseek-r1:7b", "llama3.1:8b", "mistral:7b-instruct"]
+
+# Memoria (GB) que dejamos ocupar a modelos residentes en Ollama.
+# Un 7-8B cuantizado ocupa ~5-6 GB cargado: con 12 GB caben el actual y uno precargado.
+MEMORY_BUDGET_GB = 12
+# keep_alive que pedimos a Ollama: las generaciones usan el largo; una
+# precarga especulativa, el corto (si nadie lo usa, se libera antes)
+KEEP_ALIVE_ACTIVE = "30m"
+KEEP_ALIVE_PRELOADED = "10m"
+# Un modelo se considera "en uso" si alguna sesión lo usó en esta ventana
+ACTIVE_WINDOW_S = 30 * 60
+# Sobrecoste estimado en memoria respecto al tamaño en disco (contexto, KV cache)
+LOAD_OVERHEAD = 1.2
+# Cada cuánto refrescamos /api/ps como mucho
+STATUS_TTL_S = 2.0
+
+
+class ModelPool:
+    """
+    Gestiona qué modelos están cargados en Ollama:
+
+    - aprende qué cambios de modelo hacen los usuarios y precarga el siguiente probable
+    - antes de cargar uno, descarga los menos usados si no cabe en MEMORY_BUDGET_GB;
+      toda generación pasa por ensure(), así el presupuesto vale para todas las rutas
+    - solo se descarga para el modelo elegido: una precarga especulativa se
+      salta si no cabe tal cual
+    - expone el estado (cargado / cargando / frío) para la barra lateral
+    """
+
+    def __init__(self, models: list[str] = AVAILABLE_MODELS,
+                 memory_budget_gb: float = MEMORY_BUDGET_GB):
+        self.models = list(models)
+        self.memory_budget = memory_budget_gb * 1e9
+        self._lock = threading.Lock()
+        self._transitions: dict[str, Counter] = defaultdict(Counter)
+        self._last_used: dict[str, float] = {}
+        self._loading: set[str] = set()
+        # Liberar memoria + cargar va de uno en uno: si no, dos cargas
+        # simultáneas ven la misma memoria libre y juntas se pasan del presupuesto
+        self._load_lock = threading.Lock()
+        self._disk_sizes: dict[str, int] = {}
+        self._ps_cache: tuple[float, dict] = (0.0, {})
+
+    # --- estado de Ollama ---
+
+    def loaded(self, fresh: bool = False) -> dict[str, int]:
+        """
+        {modelo: bytes en memoria} de los modelos cargados ahora mismo.
+        """
+        fetched_at, cached = self._ps_cache
+        if not fresh and time.monotonic() - fetched_at < STATUS_TTL_S:
+            return cached
+        try:
+            resp = requests.get(f"{OLLAMA_BASE_URL}/api/ps", timeout=2)
+            resp.raise_for_status()
+            models = {m["name"]: m.get("size", 0) for m in resp.json().get("models", [])}
+        except requests.RequestException:
+            models = cached
+        self._ps_cache = (time.monotonic(), models)
+        return models
+
+    def _estimated_size(self, model: str) -> float:
+        if not self._disk_sizes:
+            try:
+                resp = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=2)
+                resp.raise_for_status()
+                self._disk_sizes = {m["name"]: m.get("size", 0) for m in resp.json().get("models", [])}
+            except requests.RequestException:
+                pass
+        return self._disk_sizes.get(model, 5e9) * LOAD_OVERHEAD
+
+    def status(self) -> dict[str, str]:
+        """
+        {modelo: "loaded" | "loading" | "cold"}
+        """
+        loaded = self.loaded()
+        with self._lock:
+            loading = set(self._loading)
+        return {
+            m: "loaded" if m in loaded else "loading" if m in loading else "cold"
+            for m in self.models
+        }
+
+    # --- política ---
+
+    def _is_active(self, model: str) -> bool:
+        return time.monotonic() - self._last_used.get(model, float("-inf")) < ACTIVE_WINDOW_S
+
+    def touch(self, model: str):
+        with self._lock:
+            self._last_used[model] = time.monotonic()
+
+    def select(self, model: str, previous: str | None = None):
+        """
+        Llamar cuando una sesión elige `model` (antes tenía `previous`).
+        Asegura que esté cargado y precarga el siguiente más probable.
+        """
+        with self._lock:
+            if previous and previous != model:
+                self._transitions[previous][model] += 1
+            self._last_used[model] = time.monotonic()
+
+        loads = [(model, False)]
+        nxt = self.predict_next(model)
+        if nxt:
+            loads.append((nxt, True))
+        self._start_loads(loads)
+
+    def ensure(self, model: str):
+        """
+        Llamar antes de generar con `model`: si no está cargado, hace sitio
+        dentro del presupuesto y lo carga (bloquea hasta entonces).
+        """
+        self.touch(model)
+        if model in self.loaded():
+            return
+        with self._lock:
+            self._loading.add(model)
+        self._load(model, speculative=False)
+
+    def predict_next(self, current: str) -> str | None:
+        with self._lock:
+            seen = self._transitions.get(current)
+            if seen:
+                return seen.most_common(1)[0][0]
+            # Sin historial: el usado más recientemente distinto del actual
+            others = [m for m in self._last_used if m != current]
+            if others:
+                return max(others, key=self._last_used.get)
+        return None
+
+    def preload(self, model: str):
+        """
+        Carga el modelo en segundo plano (prompt vacío) si no está ya cargado
+        y cabe sin descargar ningún otro.
+        """
+        self._start_loads([(model, True)])
+
+    def _start_loads(self, loads: list[tuple[str, bool]]):
+        loaded = self.loaded()
+        with self._lock:
+            loads = [(m, spec) for m, spec in loads if m not in self._loading and m not in loaded]
+            self._loading.update(m for m, _ in loads)
+        if loads:
+            # Un solo hilo por llamada: el actual primero y después el siguiente
+            threading.Thread(target=self._load_all, args=(loads,), daemon=True,
+                             name=f"preload-{loads[0][0]}").start()
+
+    def _load_all(self, loads: list[tuple[str, bool]]):
+        for model, speculative in loads:
+            self._load(model, speculative)
+
+    def _load(self, model: str, speculative: bool):
+        try:
+            with self._load_lock:
+                if model in self.loaded(fresh=True):
+                    return
+                needed = self._estimated_size(model)
+                if not speculative:
+                    self._make_room(needed, protect={model})
+                elif sum(self.loaded().values()) + needed > self.memory_budget:
+                    # Hacerle sitio podría echar al recién elegido o a uno que otra sesión usa
+                    print(f"[INFO] Skipping preload of {model}: it does not fit in the memory budget")
+                    return
+                keep_alive = KEEP_ALIVE_PRELOADED if speculative else KEEP_ALIVE_ACTIVE
+                requests.post(
+                    f"{OLLAMA_BASE_URL}/api/generate",
+                    json={"model": model, "keep_alive": keep_alive},
+                    timeout=300,
+                )
+                # La siguiente carga tiene que ver esta ya en /api/ps
+                self._ps_cache = (0.0, self._ps_cache[1])
+        except requests.RequestException as e:
+            print(f"[WARN] Could not load {model}: {e}")
+        finally:
+            with self._lock:
+                self._loading.discard(model)
+
+    def _make_room(self, needed: float, protect: set[str]):
+        loaded = self.loaded(fresh=True)
+        used = sum(loaded.values())
+        with self._lock:
+            # Primero los que nadie usa y, entre ellos, los menos recientes
+            victims = sorted(
+                (name for name in loaded if name not in protect),
+                key=lambda name: (self._is_active(name), self._last_used.get(name, 0.0)),
+            )
+        for name in victims:
+            if used + needed <= self.memory_budget:
+                break
+            self.evict(name)
+            used -= loaded[name]
+
+    def evict(self, model: str):
+        try:
+            requests.post(
+                f"{OLLAMA_BASE_URL}/api/generate",
+                json={"model": model, "keep_alive": 0},
+                timeout=30,
+            )
+            print(f"[INFO] Evicted {model} from Ollama")
+        except requests.RequestException:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_model_pool() -> ModelPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool()
+    return _pool
@@ -1,12 +1,39 @@
 # src/rag_pipeline.py
 
+import json
+import queue
+import time
+from typing import Callable, Iterator
+
 import requests
 import textwrap
-from src.retriever import retrieve
+from src.embedder import embed_query
+from src.retriever import (
+    NUM_CANDIDATES, RETRIEVAL_MODE, DIVERSIFY, get_es_client, retrieve, search_vector,
+)
+from src.model_pool import KEEP_ALIVE_ACTIVE, get_model_pool
+from src.scheduler import get_scheduler, Ticket
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "qwen2.5:7b-instruct"
 
+# --- Presupuesto de latencia por petición (answer_with_budget) ---
+DEFAULT_BUDGET_S = 60
+# Con menos tiempo que esto al buscar: menos candidatos, búsqueda plana, sin MMR
+LOW_BUDGET_SEARCH_S = 20
+# Fracción del tiempo restante que puede consumir la búsqueda en ES
+SEARCH_TIMEOUT_SHARE = 0.2
+# Con menos tiempo que esto no lanzamos el LLM: respuesta solo con fuentes
+MIN_GENERATION_S = 5
+# Estimación conservadora de tokens/s del LLM local para fijar num_predict
+TOKENS_PER_SECOND_ESTIMATE = 15
+# Tope de num_predict cuando sobra tiempo
+MAX_NUM_PREDICT = 2048
+# Longitud típica de una respuesta completa; por debajo se reporta la degradación
+FULL_ANSWER_TOKENS = 600
+# Margen sobre el deadline al esperar un ticket fusionado que ya está generando
+COALESCED_GRACE_S = 2
+
 
 def build_prompt(question: str, contexts: list[str]) -> str:
     """
@@ -50,12 +77,19 @@ PREGUNTA DEL PRESIDENTE TRUMAN:
 
 
 def call_ollama(prompt: str, model: str):
-    payload = {"model": model, "prompt": prompt, "stream": False}
+    # Dentro del presupuesto de memoria antes de que Ollama lo cargue
+    get_model_pool().ensure(model)
+    payload = {"model": model, "prompt": prompt, "stream": False,
+               "keep_alive": KEEP_ALIVE_ACTIVE}
     resp = requests.post(OLLAMA_URL, json=payload, timeout=120)
-    return resp.json().get("response", "")
+    resp.raise_for_status()
+    data = resp.json()
+    if "error" in data:
+        # p.ej. modelo no descargado: mejor fallar que devolver una respuesta vacía
+        raise requests.HTTPError(f"Ollama error: {data['error']}", response=resp)
+    return data.get("response", "")
 
-def answer_question(question: str, k: int = 5, model="qwen2.5:7b-instruct"):
-    hits = retrieve(question, k=k)
+def build_contexts(hits: list[dict]) -> list[str]:
     contexts = []
     for h in hits:
         summary = h.get("summary", "")
@@ -89,8 +123,287 @@ DETAIL:
 """.strip()
 
         contexts.append(structured)
-    prompt = build_prompt(question, contexts)
-    return call_ollama(prompt, model=model)
+    return contexts
+
+def prepare_prompt(question: str, k: int = 5, filters: dict | None = None) -> str:
+    hits = retrieve(question, k=k, filters=filters)
+    return build_prompt(question, build_contexts(hits))
+
+def submit_generation(prompt: str, model: str) -> Ticket:
+    """
+    Encola la generación en el scheduler compartido.
+    Dos sesiones con el mismo (prompt, modelo) en vuelo comparten la respuesta.
+    """
+    return get_scheduler().submit((prompt, model), call_ollama, prompt, model=model)
+
+class Deadline:
+    def __init__(self, budget_s: float, started_at: float | None = None):
+        self.budget_s = budget_s
+        # started_at (monotonic): cuando llegó la petición, si esperó antes de empezar
+        self.expires_at = (time.monotonic() if started_at is None else started_at) + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def stream_ollama(prompt: str, model: str, options: dict | None = None,
+                  timeout: float = 120) -> Iterator[dict]:
+    """
+    Generación en streaming: devuelve cada objeto NDJSON de Ollama
+    ({"response": token, ...}; el último trae "done": true y estadísticas).
+    """
+    # Dentro del presupuesto de memoria antes de que Ollama lo cargue
+    get_model_pool().ensure(model)
+    payload = {"model": model, "prompt": prompt, "stream": True,
+               "keep_alive": KEEP_ALIVE_ACTIVE}
+    if options:
+        payload["options"] = options
+    with requests.post(OLLAMA_URL, json=payload, stream=True, timeout=(5, timeout)) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def stream_generation(prompt: str, model: str, on_token: Callable[[str], None]):
+    """
+    Generación en streaming que entrega cada token a on_token. Pensada para
+    correr en el scheduler (p.ej. /answer/stream del servidor).
+    """
+    for event in stream_ollama(prompt, model):
+        token = event.get("response", "")
+        if token:
+            on_token(token)
+
+
+def generate_until(prompt: str, model: str, num_predict: int, deadline: Deadline,
+                   on_token: Callable[[str], None] | None = None) -> tuple[str, bool]:
+    """
+    Genera hasta terminar, agotar num_predict o vencer el deadline.
+    Devuelve (texto, completo).
+    """
+    if deadline.remaining() < MIN_GENERATION_S:
+        return "", False
+
+    tokens = []
+    try:
+        for event in stream_ollama(prompt, model, options={"num_predict": num_predict},
+                                   timeout=deadline.remaining()):
+            token = event.get("response", "")
+            tokens.append(token)
+            if token and on_token is not None:
+                on_token(token)
+            if event.get("done"):
+                # done_reason == "length": cortado por num_predict
+                return "".join(tokens), event.get("done_reason") != "length"
+            if deadline.expired():
+                break
+    except requests.RequestException:
+        pass
+    return "".join(tokens), False
+
+
+def sources_only_answer(hits: list[dict]) -> str:
+    if not hits:
+        return "Presidente Truman, no he podido consultar los documentos a tiempo."
+    lines = [f"- {h.get('topic', '')} ({h.get('url', '')})" for h in hits]
+    return (
+        "Presidente Truman, no dispongo de tiempo para un análisis completo. "
+        "Estos son los documentos más relevantes:\n\n" + "\n".join(lines)
+    )
+
+
+def answer_with_budget(question: str, k: int = 5, model: str = MODEL_NAME,
+                       filters: dict | None = None, budget_s: float = DEFAULT_BUDGET_S,
+                       progress: Callable[[int], None] | None = None,
+                       on_token: Callable[[str], None] | None = None,
+                       started_at: float | None = None) -> dict:
+    """
+    Respuesta con latencia acotada de extremo a extremo. Cada etapa recibe
+    el tiempo que queda y se degrada en vez de colgarse:
+
+      - búsqueda con timeout de ES; con poco margen, menos candidatos y sin MMR
+      - num_predict y timeout de Ollama derivados del tiempo restante
+      - si no da tiempo a generar: solo fuentes; si se corta: respuesta parcial
+
+    `progress(posición)` se llama mientras la petición espera en la cola y
+    `on_token(token)` con cada token generado. `started_at` (time.monotonic())
+    adelanta el inicio del presupuesto, p.ej. a la llegada al servidor.
+    Devuelve {"answer", "sources", "partial", "degradations", "elapsed_s"}.
+    """
+    deadline = Deadline(budget_s, started_at)
+    degradations: list[str] = []
+
+    def result(answer: str, hits: list[dict], partial: bool) -> dict:
+        return {
+            "answer": answer,
+            "sources": [{"topic": h.get("topic", ""), "url": h.get("url", "")} for h in hits],
+            "partial": partial,
+            "degradations": degradations,
+            "elapsed_s": round(budget_s - deadline.remaining(), 2),
+        }
+
+    # 1. Retrieval
+    q_vector = embed_query(question)
+    search_kwargs = {"mode": RETRIEVAL_MODE, "diversify": DIVERSIFY, "num_candidates": None}
+    if deadline.remaining() < LOW_BUDGET_SEARCH_S:
+        search_kwargs = {"mode": "flat", "diversify": False,
+                         "num_candidates": max(k, NUM_CANDIDATES // 4)}
+        degradations.append("reduced_search")
+
+    info: dict = {}
+    try:
+        hits = search_vector(get_es_client(), q_vector, k=k, filters=filters,
+                             timeout_s=deadline.remaining() * SEARCH_TIMEOUT_SHARE,
+                             info=info, **search_kwargs)
+    except Exception:
+        degradations.append("search_failed")
+        return result(sources_only_answer([]), [], partial=True)
+    if info.get("timed_out"):
+        degradations.append("search_timed_out")
+
+    # 2. Generación
+    if deadline.remaining() < MIN_GENERATION_S:
+        degradations.append("generation_skipped")
+        return result(sources_only_answer(hits), hits, partial=True)
+
+    num_predict = min(MAX_NUM_PREDICT,
+                      int((deadline.remaining() - 1) * TOKENS_PER_SECOND_ESTIMATE))
+    if num_predict < FULL_ANSWER_TOKENS:
+        degradations.append("num_predict_limited")
+
+    prompt = build_prompt(question, build_contexts(hits))
+    # num_predict no entra en la clave: depende del segundo de llegada y dos
+    # sesiones con la misma pregunta no se fusionarían nunca. Quien se une a un
+    # ticket recibe la respuesta con el presupuesto del primero.
+    # Con on_token cada petición necesita su propio stream: no se fusiona
+    key = (prompt, model) if on_token is None else None
+    ticket = get_scheduler().submit(
+        key, generate_until, prompt, model, num_predict, deadline, on_token,
+    )
+    while not ticket.wait(timeout=0.5):
+        position = ticket.position()
+        if position > 0:
+            if deadline.expired():
+                degradations.append("queue_timeout")
+                return result(sources_only_answer(hits), hits, partial=True)
+            if progress is not None:
+                progress(position)
+        elif time.monotonic() > deadline.expires_at + COALESCED_GRACE_S:
+            # Ya generando: generate_until se corta solo en su deadline. Solo se
+            # abandona si el ticket era de otra petición con más presupuesto.
+            degradations.append("generation_timed_out")
+            return result(sources_only_answer(hits), hits, partial=True)
+
+    text, complete = ticket.result()
+    if not text:
+        degradations.append("generation_timed_out")
+        return result(sources_only_answer(hits), hits, partial=True)
+    if not complete:
+        degradations.append("partial_answer")
+    return result(text, hits, partial=not complete)
+
+
+class ModelRun:
+    """
+    Una generación del modo comparación. El hilo del scheduler va dejando
+    tokens en `tokens`; la UI los recoge con drain().
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.tokens: queue.Queue = queue.Queue()
+        self.text = ""
+        self.submitted_at = time.monotonic()
+        # Cuando el scheduler la saca de la cola (con el límite por defecto de 1,
+        # las columnas esperan a que terminen las anteriores)
+        self.started_at: float | None = None
+        self.first_token_at: float | None = None
+        self.finished_at: float | None = None
+        self.eval_count = 0
+        self.eval_duration_s = 0.0
+        self.error: str | None = None
+        self.ticket: Ticket | None = None
+
+    def _run(self, prompt: str):
+        self.started_at = time.monotonic()
+        try:
+            for event in stream_ollama(prompt, self.model):
+                token = event.get("response", "")
+                if token:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.monotonic()
+                    self.tokens.put(token)
+                if event.get("done"):
+                    self.eval_count = event.get("eval_count", 0)
+                    self.eval_duration_s = event.get("eval_duration", 0) / 1e9
+        except requests.RequestException as e:
+            self.error = str(e)
+        finally:
+            self.finished_at = time.monotonic()
+
+    def drain(self) -> bool:
+        """
+        Pasa los tokens pendientes a `text`. True si ha llegado algo nuevo.
+        """
+        changed = False
+        while True:
+            try:
+                self.text += self.tokens.get_nowait()
+                changed = True
+            except queue.Empty:
+                return changed
+
+    def done(self) -> bool:
+        return self.ticket is not None and self.ticket.done() and self.tokens.empty()
+
+    @property
+    def queue_wait_s(self) -> float | None:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    @property
+    def latency_s(self) -> float | None:
+        """
+        Duración de la generación propia, sin la espera en cola.
+        """
+        if self.finished_at is None or self.started_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def tokens_per_s(self) -> float | None:
+        if not self.eval_duration_s:
+            return None
+        return self.eval_count / self.eval_duration_s
+
+
+def compare_models(question: str, models: list[str], k: int = 5,
+                   filters: dict | None = None) -> tuple[list[dict], list[ModelRun]]:
+    """
+    Retrieval y prompt una sola vez; la generación se reparte entre los modelos
+    a través del scheduler compartido (respeta MAX_CONCURRENT_GENERATIONS).
+    """
+    hits = retrieve(question, k=k, filters=filters)
+    prompt = build_prompt(question, build_contexts(hits))
+
+    runs = []
+    for model in models:
+        run = ModelRun(model)
+        # key=None: cada columna necesita su propio stream de tokens
+        run.ticket = get_scheduler().submit(None, run._run, prompt)
+        runs.append(run)
+    return hits, runs
+
+
+def answer_question(question: str, k: int = 5, model="qwen2.5:7b-instruct",
+                    filters: dict | None = None):
+    prompt = prepare_prompt(question, k=k, filters=filters)
+    return submit_generation(prompt, model).result()
 
 
 if __name__ == "__main__":
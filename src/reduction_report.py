@@ -0,0 +1,96 @@
+# src/reduction_report.py
+#
+# Barrido de dimensiones PCA frente a los vectores completos (384):
+# recall@k, bytes de vectores en el índice y latencia por query.
+# Sirve para elegir indexer.REDUCED_DIMS.
+#
+#   python src/reduction_report.py                       # vectores desde ES
+#   python src/reduction_report.py --snapshot data/snapshots/<dir>
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow.parquet as pq
+from elasticsearch import helpers
+
+from embedder import embed_queries, fit_projection, project
+from indexer import EMBEDDING_DIMS, INDEX_NAME, get_es_client, iter_records
+
+DIMS_SWEEP = [32, 64, 96, 128, 192, 256, EMBEDDING_DIMS]
+
+
+def load_corpus_vectors(snapshot_dir: Path | None) -> np.ndarray:
+    if snapshot_dir is not None:
+        column = pq.read_table(snapshot_dir / "chunks.parquet", columns=["embedding"]).column("embedding")
+        dims = column.type.list_size
+        vectors = column.combine_chunks().flatten().to_numpy(zero_copy_only=False).reshape(-1, dims)
+    else:
+        hits = helpers.scan(get_es_client(), index=INDEX_NAME,
+                            query={"query": {"match_all": {}}, "_source": ["embedding"]})
+        vectors = np.asarray([h["_source"]["embedding"] for h in hits], dtype=np.float32)
+
+    if vectors.shape[1] != EMBEDDING_DIMS:
+        raise ValueError(
+            f"Corpus vectors have {vectors.shape[1]} dims; the report needs the full "
+            f"{EMBEDDING_DIMS}-dim vectors (index without REDUCED_DIMS or use a full snapshot)."
+        )
+    return vectors.astype(np.float32)
+
+
+def sample_queries(n: int, seed: int = 0) -> list[str]:
+    points = [p for rec in iter_records() for p in rec.get("key_points", []) if isinstance(p, str) and p.strip()]
+    random.Random(seed).shuffle(points)
+    return points[:n]
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    idx = np.argpartition(-scores, k, axis=1)[:, :k]
+    return idx
+
+
+def report(snapshot_dir: Path | None = None, n_queries: int = 200, k: int = 10):
+    corpus = load_corpus_vectors(snapshot_dir)
+    queries = np.asarray(embed_queries(sample_queries(n_queries), reduce=False), dtype=np.float32)
+    if len(queries) == 0:
+        print("[WARN] No key_points found to use as queries")
+        return
+    k = min(k, len(corpus) - 1)
+    print(f"[INFO] {len(corpus)} chunks, {len(queries)} queries, k={k}")
+
+    truth = top_k(corpus, queries, k)
+
+    print(f"\n{'dims':>6}{'recall@' + str(k):>11}{'index MB':>11}{'ms/query':>10}")
+    for dims in DIMS_SWEEP:
+        if dims >= EMBEDDING_DIMS:
+            reduced_corpus = corpus
+            to_query = lambda q: q
+        else:
+            projection = fit_projection(corpus, dims)
+            reduced_corpus = project(corpus, projection)
+            to_query = lambda q, p=projection: project(q, p)
+
+        start = time.perf_counter()
+        reduced_queries = to_query(queries)
+        found = top_k(reduced_corpus, reduced_queries, k)
+        ms_per_query = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(truth.tolist(), found.tolist())
+        ])
+        # Solo los vectores float32; el grafo HNSW escala con nº de docs, no con dims
+        index_mb = reduced_corpus.shape[0] * dims * 4 / 1e6
+        print(f"{dims:>6}{recall:>11.3f}{index_mb:>11.1f}{ms_per_query:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs size report for reduced embeddings")
+    parser.add_argument("--snapshot", type=Path, default=None,
+                        help="Snapshot directory with full-dim vectors (default: read from ES)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    report(args.snapshot, args.queries, args.k)
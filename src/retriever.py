@@ -1,20 +1,114 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
+import numpy as np
 from elasticsearch import Elasticsearch
 
-from src.embedder import embed_query
+from src.embedder import embed_query, set_projection_source
 
+# Alias de lectura; los índices físicos versionados los gestiona indexer.py
 INDEX_NAME = "ww2_wiki"
+ARTICLE_INDEX_NAME = "ww2_articles"
+ES_URL = "http://localhost:9200"
 
 def get_es_client() -> Elasticsearch:
-    return Elasticsearch("http://localhost:9200")
+    return Elasticsearch(ES_URL)
 
-def retrieve(query: str, k: int = 5) -> List[Dict[str, Any]]:
-    client = get_es_client()
-    q_vector = embed_query(query)
+def live_meta() -> dict:
+    """
+    _meta del índice publicado. Corto y sin reintentos: se consulta desde el
+    camino de los embeddings de query.
+    """
+    client = get_es_client().options(request_timeout=2, max_retries=0)
+    resp = client.indices.get_mapping(index=INDEX_NAME)
+    return next(iter(resp.values()))["mappings"].get("_meta", {})
+
+set_projection_source(live_meta)
+
+SOURCE_FIELDS = ["topic", "summary", "raw_text", "url", "key_points", "locations", "people", "date"]
+
+# Candidatos por shard que explora el HNSW antes de quedarse con los k mejores
+NUM_CANDIDATES = 100
+
+# Búsqueda jerárquica: primero los TOP_ARTICLES artículos más cercanos
+# (índice de resúmenes), luego chunks solo dentro de ellos.
+# Más artículos = más recall, más latencia.
+RETRIEVAL_MODE = "flat"  # "flat" | "hierarchical"
+TOP_ARTICLES = 8
+
+# MMR: se piden k * MMR_FETCH_FACTOR candidatos y se eligen k que sean
+# relevantes pero distintos entre sí (evita repetir el mismo pasaje en el prompt).
+# MMR_LAMBDA = 1.0 equivale a ordenar solo por relevancia.
+DIVERSIFY = True
+MMR_LAMBDA = 0.7
+MMR_FETCH_FACTOR = 4
+
+def build_filter(filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Traduce filtros de alto nivel a cláusulas ES que pre-filtran el kNN.
+
+    filters admite:
+      - year_from / year_to: periodo (se cruza con el rango de años del artículo)
+      - location: lugar exacto (sin distinguir mayúsculas/acentos)
+      - person: persona u organización exacta
+    """
+    if not filters:
+        return []
+
+    clauses = []
+    year_from = filters.get("year_from")
+    year_to = filters.get("year_to")
+    if year_from is not None or year_to is not None:
+        years = {"relation": "intersects"}
+        if year_from is not None:
+            years["gte"] = int(year_from)
+        if year_to is not None:
+            years["lte"] = int(year_to)
+        clauses.append({"range": {"years": years}})
+    if filters.get("location"):
+        clauses.append({"term": {"locations": filters["location"]}})
+    if filters.get("person"):
+        clauses.append({"term": {"people": filters["person"]}})
+    return clauses
+
+def build_search_body(q_vector: list, k: int = 5,
+                      filters: Optional[Dict[str, Any]] = None,
+                      article_ids: Optional[List[str]] = None,
+                      with_embedding: bool = False,
+                      num_candidates: Optional[int] = None) -> Dict[str, Any]:
+    knn = {
+        "field": "embedding",
+        "query_vector": q_vector,
+        "k": k,
+        "num_candidates": max(num_candidates or NUM_CANDIDATES, k),
+    }
+    clauses = build_filter(filters)
+    if article_ids is not None:
+        clauses.append({"terms": {"article_id": article_ids}})
+    if clauses:
+        knn["filter"] = clauses
+
+    return {
+        "size": k,
+        "_source": SOURCE_FIELDS + (["embedding"] if with_embedding else []),
+        "knn": knn,
+    }
+
+def build_article_search_body(q_vector: list, top_articles: int = TOP_ARTICLES,
+                              filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    body = build_search_body(q_vector, k=top_articles, filters=filters)
+    body["_source"] = ["article_id"]
+    return body
 
-    body = {
-        "_source": ["topic", "summary", "raw_text", "url", "key_points", "locations", "people", "date"],
+def parse_article_ids(resp: Dict[str, Any]) -> List[str]:
+    return [h["_source"]["article_id"] for h in resp["hits"]["hits"]]
+
+def build_exact_search_body(q_vector: list, k: int = 5) -> Dict[str, Any]:
+    """
+    Fuerza bruta (coseno contra todos los chunks). Solo para evaluación.
+    """
+    return {
+        "size": k,
+        "_source": SOURCE_FIELDS,
         "query": {
             "script_score": {
                 "query": {"match_all": {}},
@@ -26,24 +120,153 @@ def retrieve(query: str, k: int = 5) -> List[Dict[str, Any]]:
         }
     }
 
-    resp = client.search(index=INDEX_NAME, body=body)
+def _as_text(value) -> str:
+    # locations/people se indexan como listas de keywords
+    if isinstance(value, list):
+        return ", ".join(value)
+    return value or ""
+
+def parse_hits(resp: Dict[str, Any]) -> List[Dict[str, Any]]:
     hits = resp["hits"]["hits"]
-    results = [
+    return [
         {
+            "id": h["_id"],
             "score": h["_score"],
             "topic": h["_source"].get("topic", ""),
             "summary": h["_source"].get("summary", ""),
             "raw_text": h["_source"].get("raw_text", ""),
             "url": h["_source"].get("url", ""),
             "key_points": h["_source"].get("key_points", ""),
-            "locations": h["_source"].get("locations", ""),
-            "people": h["_source"].get("people", ""),
+            "locations": _as_text(h["_source"].get("locations", "")),
+            "people": _as_text(h["_source"].get("people", "")),
             "date": h["_source"].get("date", ""),
         }
         for h in hits
     ]
+
+def mmr_select(q_vector: list, vectors: list, k: int, lambda_: float = MMR_LAMBDA) -> List[int]:
+    """
+    Maximal Marginal Relevance sobre vectores normalizados (coseno = producto escalar).
+    """
+    if not vectors:
+        return []
+    docs = np.asarray(vectors, dtype=np.float32)
+    relevance = docs @ np.asarray(q_vector, dtype=np.float32)
+    pairwise = docs @ docs.T
+
+    selected = [int(np.argmax(relevance))]
+    remaining = set(range(len(docs))) - set(selected)
+    while remaining and len(selected) < k:
+        candidates = list(remaining)
+        redundancy = pairwise[np.ix_(candidates, selected)].max(axis=1)
+        scores = lambda_ * relevance[candidates] - (1 - lambda_) * redundancy
+        best = candidates[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+def diversify_hits(q_vector: list, resp: Dict[str, Any], k: int,
+                   lambda_: float = MMR_LAMBDA) -> List[Dict[str, Any]]:
+    raw = resp["hits"]["hits"]
+    order = mmr_select(q_vector, [h["_source"]["embedding"] for h in raw], k, lambda_)
+    return parse_hits({"hits": {"hits": [raw[i] for i in order]}})
+
+def _search(client: Elasticsearch, index: str, body: Dict[str, Any],
+            timeout_s: Optional[float], info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if timeout_s is not None:
+        # ES corta la búsqueda y devuelve lo que tenga (timed_out=True)
+        body = {**body, "timeout": f"{max(1, int(timeout_s * 1000))}ms"}
+        client = client.options(request_timeout=timeout_s + 1)
+    resp = client.search(index=index, body=body)
+    if info is not None and resp.get("timed_out"):
+        info["timed_out"] = True
+    return resp
+
+def search_vector(client: Elasticsearch, q_vector: list, k: int = 5,
+                  filters: Optional[Dict[str, Any]] = None,
+                  mode: str = RETRIEVAL_MODE,
+                  top_articles: int = TOP_ARTICLES,
+                  diversify: bool = DIVERSIFY,
+                  num_candidates: Optional[int] = None,
+                  timeout_s: Optional[float] = None,
+                  info: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    timeout_s acota cada búsqueda ES; si alguna vuelve incompleta se marca
+    info["timed_out"] = True.
+    """
+    article_ids = None
+    if mode == "hierarchical":
+        resp = _search(client, ARTICLE_INDEX_NAME,
+                       build_article_search_body(q_vector, top_articles, filters),
+                       timeout_s, info)
+        article_ids = parse_article_ids(resp)
+        if not article_ids:
+            return []
+    elif mode != "flat":
+        raise ValueError(f"Unknown retrieval mode: {mode!r}")
+
+    fetch_k = k * MMR_FETCH_FACTOR if diversify else k
+    body = build_search_body(q_vector, k=fetch_k, filters=filters, article_ids=article_ids,
+                             with_embedding=diversify, num_candidates=num_candidates)
+    resp = _search(client, INDEX_NAME, body, timeout_s, info)
+    if diversify:
+        return diversify_hits(q_vector, resp, k)
+    return parse_hits(resp)
+
+def msearch_vectors(client: Elasticsearch, q_vectors: List[list], k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None,
+                    mode: str = RETRIEVAL_MODE,
+                    top_articles: int = TOP_ARTICLES,
+                    diversify: bool = DIVERSIFY) -> List[Optional[List[Dict[str, Any]]]]:
+    """
+    Igual que search_vector pero para muchas queries en un solo _msearch
+    (dos en modo jerárquico). Pensado para procesado por lotes.
+    Las queries en las que ES devolvió error quedan como None (no como []).
+    """
+    article_ids: List[Optional[List[str]]] = [None] * len(q_vectors)
+    failed = [False] * len(q_vectors)
+    if mode == "hierarchical":
+        searches = []
+        for vec in q_vectors:
+            searches += [{"index": ARTICLE_INDEX_NAME},
+                         build_article_search_body(vec, top_articles, filters)]
+        responses = client.msearch(searches=searches)["responses"]
+        failed = ["error" in r for r in responses]
+        article_ids = [[] if "error" in r else parse_article_ids(r) for r in responses]
+    elif mode != "flat":
+        raise ValueError(f"Unknown retrieval mode: {mode!r}")
+
+    fetch_k = k * MMR_FETCH_FACTOR if diversify else k
+    searches = []
+    for vec, ids in zip(q_vectors, article_ids):
+        searches += [{"index": INDEX_NAME},
+                     build_search_body(vec, k=fetch_k, filters=filters,
+                                       article_ids=ids, with_embedding=diversify)]
+    responses = client.msearch(searches=searches)["responses"]
+
+    results = []
+    for vec, ids, resp, err in zip(q_vectors, article_ids, responses, failed):
+        # Error, timeout o shards fallidos: resultado incompleto, no "sin resultados"
+        if err or "error" in resp or resp.get("timed_out") or resp.get("_shards", {}).get("failed"):
+            results.append(None)
+        elif ids == []:
+            results.append([])
+        elif diversify:
+            results.append(diversify_hits(vec, resp, k))
+        else:
+            results.append(parse_hits(resp))
     return results
 
+def retrieve(query: str, k: int = 5,
+             filters: Optional[Dict[str, Any]] = None,
+             mode: str = RETRIEVAL_MODE,
+             top_articles: int = TOP_ARTICLES,
+             diversify: bool = DIVERSIFY) -> List[Dict[str, Any]]:
+    client = get_es_client()
+    q_vector = embed_query(query)
+    return search_vector(client, q_vector, k=k, filters=filters,
+                         mode=mode, top_articles=top_articles, diversify=diversify)
+
 if __name__ == "__main__":
     docs = retrieve("What was Operation Barbarossa?", k=3)
     for i, d in enumerate(docs):
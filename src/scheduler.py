@@ -0,0 +1,152 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Hashable, Optional
+
+# Cuántas generaciones dejamos correr a la vez contra el Ollama local.
+# Con un solo servidor y modelos de 7-8B, más de 1-2 solo reparte la GPU/CPU
+# entre todos y hace que todas las peticiones lleguen al timeout.
+MAX_CONCURRENT_GENERATIONS = 1
+
+
+class Ticket:
+    """
+    Handle de una generación encolada.
+    Varias sesiones pueden compartir el mismo ticket si piden lo mismo.
+    """
+
+    def __init__(self, scheduler: "GenerationScheduler", key: Optional[Hashable],
+                 fn: Callable[..., Any], args: tuple, kwargs: dict):
+        self.key = key
+        self._scheduler = scheduler
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._done = threading.Event()
+        self._result = None
+        self._error: Optional[BaseException] = None
+        self._callbacks: list[Callable[["Ticket"], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def position(self) -> int:
+        """
+        1 = siguiente en salir de la cola, 0 = ya se está generando (o terminó).
+        """
+        return self._scheduler.position(self)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def result(self, timeout: Optional[float] = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Generation still pending")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def add_done_callback(self, fn: Callable[["Ticket"], None]):
+        """
+        fn(ticket) al terminar, en el hilo del worker (o ya, si ha terminado).
+        Para esperar desde asyncio sin ocupar un hilo.
+        """
+        with self._callbacks_lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _run(self):
+        try:
+            self._result = self._fn(*self._args, **self._kwargs)
+        except BaseException as e:  # se propaga a quien llame a result()
+            self._error = e
+        finally:
+            with self._callbacks_lock:
+                self._done.set()
+                callbacks, self._callbacks = self._callbacks, []
+            for fn in callbacks:
+                fn(self)
+
+
+class GenerationScheduler:
+    """
+    Cola FIFO compartida por todas las sesiones de Streamlit delante de Ollama.
+
+    - Como mucho `max_concurrent` generaciones en paralelo.
+    - Peticiones idénticas en vuelo (misma key) comparten un único ticket.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_GENERATIONS):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._waiting: deque[Ticket] = deque()
+        self._inflight: dict[Hashable, Ticket] = {}
+        self._running = 0
+        self._workers: list[threading.Thread] = []
+
+    def submit(self, key: Optional[Hashable], fn: Callable[..., Any], *args, **kwargs) -> Ticket:
+        """
+        Encola fn(*args, **kwargs). Con key=None nunca se fusiona con otra petición.
+        """
+        with self._cond:
+            if key is not None and key in self._inflight:
+                return self._inflight[key]
+
+            ticket = Ticket(self, key, fn, args, kwargs)
+            if key is not None:
+                self._inflight[key] = ticket
+            self._waiting.append(ticket)
+            self._ensure_workers()
+            self._cond.notify()
+            return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        with self._cond:
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+            }
+
+    def _ensure_workers(self):
+        # Un hilo por slot de concurrencia; se crean bajo demanda.
+        while len(self._workers) < self.max_concurrent:
+            t = threading.Thread(target=self._worker, daemon=True,
+                                 name=f"ollama-gen-{len(self._workers)}")
+            self._workers.append(t)
+            t.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._waiting:
+                    self._cond.wait()
+                ticket = self._waiting.popleft()
+                self._running += 1
+
+            ticket._run()
+
+            with self._cond:
+                self._running -= 1
+                if ticket.key is not None and self._inflight.get(ticket.key) is ticket:
+                    del self._inflight[ticket.key]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> GenerationScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GenerationScheduler(MAX_CONCURRENT_GENERATIONS)
+    return _scheduler
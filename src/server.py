@@ -0,0 +1,325 @@
+# src/server.py
+#
+# Servicio HTTP asíncrono (tornado) delante del pipeline RAG.
+# Permite escalar el motor (ES + embeddings + Ollama) por separado de la UI:
+#
+#   python -m src.server            # escucha en :8000
+#   RAG_API_URL=http://localhost:8000 streamlit run app.py
+#
+# Endpoints:
+#   GET  /health          proceso vivo
+#   GET  /ready           ES, Ollama y modelo de embeddings disponibles
+#   GET  /stats           histograma de tamaños de batch de embeddings
+#   POST /retrieve        {"question", "k", "filters"}            -> {"hits": [...]}
+#   POST /answer          {"question", "k", "model", "filters"}   -> {"answer", "sources"}
+#                         + "budget_s": latencia acotada -> también {"partial", "degradations"}
+#   POST /answer/stream   igual que /answer, NDJSON: {"token"}... {"done", "sources"}
+#                         (+ "partial", "degradations" con budget_s)
+#   GET  /models          modelos del motor y su estado en Ollama (+ "default_budget_s")
+#   POST /models/select   {"model", "previous"}: lo carga y precarga el siguiente probable
+#
+# ES va por AsyncHTTPClient. Ollama no: todas las generaciones pasan por el
+# GenerationScheduler del proceso (una llamada bloqueante en cada uno de sus
+# MAX_CONCURRENT_GENERATIONS hilos), así el límite es uno solo sea cual sea el
+# endpoint, la CLI por lotes o la UI en proceso. El event loop solo espera el
+# ticket (wait_ticket), nunca un hilo bloqueado.
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado import httpclient, web
+
+from src.embedder import QUERY_BATCH_MAX_SIZE, embed_query, get_model, get_query_batcher
+from src.model_pool import get_model_pool
+from src.rag_pipeline import (
+    DEFAULT_BUDGET_S, OLLAMA_URL, MODEL_NAME, answer_with_budget, build_contexts, build_prompt,
+    stream_generation, submit_generation,
+)
+from src.retriever import (
+    ARTICLE_INDEX_NAME, DIVERSIFY, ES_URL, INDEX_NAME, MMR_FETCH_FACTOR, RETRIEVAL_MODE,
+    TOP_ARTICLES, build_article_search_body, build_search_body, diversify_hits,
+    parse_article_ids, parse_hits,
+)
+from src.scheduler import Ticket, get_scheduler
+
+PORT = 8000
+OLLAMA_TAGS_URL = OLLAMA_URL.replace("/api/generate", "/api/tags")
+
+# El encode de sentence-transformers es CPU-bound: fuera del event loop.
+# Los hilos solo esperan al micro-batcher, así que caben tantos como un batch.
+EMBED_WORKERS = QUERY_BATCH_MAX_SIZE
+ES_TIMEOUT = 30
+
+_executor = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
+# Peticiones con budget_s: answer_with_budget es síncrono y ocupa un hilo hasta
+# el final. Pool propio y holgado (casi todo es esperar); si aun así se llena,
+# la espera cuenta contra el deadline (started_at) y la respuesta se degrada.
+BUDGET_WORKERS = 64
+_budget_executor = ThreadPoolExecutor(max_workers=BUDGET_WORKERS, thread_name_prefix="budget")
+_embedder_ready = False
+
+
+async def _embed(text: str) -> list:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, embed_query, text)
+
+
+async def _es_search(index: str, body: dict) -> dict:
+    resp = await httpclient.AsyncHTTPClient().fetch(
+        f"{ES_URL}/{index}/_search",
+        method="POST",
+        body=json.dumps(body),
+        headers={"Content-Type": "application/json"},
+        request_timeout=ES_TIMEOUT,
+    )
+    return json.loads(resp.body)
+
+
+async def retrieve_async(question: str, k: int = 5, filters: dict | None = None) -> list[dict]:
+    q_vector = await _embed(question)
+
+    article_ids = None
+    if RETRIEVAL_MODE == "hierarchical":
+        resp = await _es_search(ARTICLE_INDEX_NAME,
+                                build_article_search_body(q_vector, TOP_ARTICLES, filters))
+        article_ids = parse_article_ids(resp)
+        if not article_ids:
+            return []
+
+    fetch_k = k * MMR_FETCH_FACTOR if DIVERSIFY else k
+    body = build_search_body(q_vector, k=fetch_k, filters=filters,
+                             article_ids=article_ids, with_embedding=DIVERSIFY)
+    resp = await _es_search(INDEX_NAME, body)
+    if DIVERSIFY:
+        return diversify_hits(q_vector, resp, k)
+    return parse_hits(resp)
+
+
+async def wait_ticket(ticket: Ticket):
+    """
+    Espera un ticket del scheduler desde el event loop, sin ocupar un hilo.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(t: Ticket):
+        if future.done():
+            return
+        try:
+            future.set_result(t.result())
+        except BaseException as e:
+            future.set_exception(e)
+
+    ticket.add_done_callback(lambda t: loop.call_soon_threadsafe(settle, t))
+    return await future
+
+
+async def generate_async(prompt: str, model: str) -> str:
+    """
+    Generación no-streaming. Peticiones idénticas en vuelo comparten resultado.
+    """
+    return await wait_ticket(submit_generation(prompt, model))
+
+
+def _sources(hits: list[dict]) -> list[dict]:
+    return [{"topic": h["topic"], "url": h["url"], "score": h["score"]} for h in hits]
+
+
+class JSONHandler(web.RequestHandler):
+    def json_body(self) -> dict:
+        try:
+            data = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise web.HTTPError(400, reason="Invalid JSON body")
+        if not isinstance(data, dict):
+            raise web.HTTPError(400, reason="JSON body must be an object")
+        return data
+
+    def question_args(self) -> tuple[str, int, str, dict | None]:
+        data = self.json_body()
+        question = (data.get("question") or "").strip()
+        if not question:
+            raise web.HTTPError(400, reason="Missing 'question'")
+        try:
+            k = int(data.get("k", 5))
+        except (TypeError, ValueError):
+            raise web.HTTPError(400, reason="'k' must be an integer")
+        if k < 1:
+            raise web.HTTPError(400, reason="'k' must be positive")
+        model = data.get("model") or MODEL_NAME
+        filters = data.get("filters") or None
+        if filters is not None and not isinstance(filters, dict):
+            raise web.HTTPError(400, reason="'filters' must be an object")
+        return question, k, model, filters
+
+    def budget_arg(self) -> float | None:
+        budget_s = self.json_body().get("budget_s")
+        if budget_s is None:
+            return None
+        try:
+            budget_s = float(budget_s)
+        except (TypeError, ValueError):
+            raise web.HTTPError(400, reason="'budget_s' must be a number")
+        if not budget_s > 0:
+            raise web.HTTPError(400, reason="'budget_s' must be positive")
+        return budget_s
+
+
+class HealthHandler(JSONHandler):
+    def get(self):
+        self.write({"status": "ok"})
+
+
+class ReadyHandler(JSONHandler):
+    async def get(self):
+        checks = {}
+        client = httpclient.AsyncHTTPClient()
+        for name, url in [("elasticsearch", f"{ES_URL}/{INDEX_NAME}/_count"),
+                          ("ollama", OLLAMA_TAGS_URL)]:
+            try:
+                await client.fetch(url, request_timeout=5)
+                checks[name] = True
+            except Exception:
+                checks[name] = False
+        checks["embedder"] = _embedder_ready
+        ready = all(checks.values())
+        self.set_status(200 if ready else 503)
+        self.write({"ready": ready, "checks": checks})
+
+
+class StatsHandler(JSONHandler):
+    def get(self):
+        self.write({"embed_batch_sizes": get_query_batcher().histogram()})
+
+
+class RetrieveHandler(JSONHandler):
+    async def post(self):
+        question, k, _, filters = self.question_args()
+        hits = await retrieve_async(question, k=k, filters=filters)
+        self.write({"hits": hits})
+
+
+class ModelsHandler(JSONHandler):
+    async def get(self):
+        # status() puede consultar /api/ps de Ollama: fuera del loop
+        loop = asyncio.get_running_loop()
+        status = await loop.run_in_executor(None, get_model_pool().status)
+        self.write({"models": status, "default_budget_s": DEFAULT_BUDGET_S})
+
+
+class SelectModelHandler(JSONHandler):
+    async def post(self):
+        data = self.json_body()
+        model = data.get("model")
+        pool = get_model_pool()
+        if model not in pool.models:
+            raise web.HTTPError(400, reason="Unknown 'model'")
+        loop = asyncio.get_running_loop()
+        # Las cargas van en segundo plano; select() solo las lanza
+        await loop.run_in_executor(None, lambda: pool.select(model, previous=data.get("previous")))
+        self.write({"status": "ok"})
+
+
+class AnswerHandler(JSONHandler):
+    async def post(self):
+        arrived = time.monotonic()
+        question, k, model, filters = self.question_args()
+        budget_s = self.budget_arg()
+        if budget_s is not None:
+            # Camino con deadline (bloqueante): en un hilo para no frenar el loop
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                _budget_executor,
+                lambda: answer_with_budget(question, k=k, model=model, filters=filters,
+                                           budget_s=budget_s, started_at=arrived),
+            )
+            self.write(result)
+            return
+
+        hits = await retrieve_async(question, k=k, filters=filters)
+        prompt = build_prompt(question, build_contexts(hits))
+        answer = await generate_async(prompt, model)
+        self.write({"answer": answer, "sources": _sources(hits)})
+
+
+class StreamAnswerHandler(JSONHandler):
+    async def post(self):
+        arrived = time.monotonic()
+        question, k, model, filters = self.question_args()
+        budget_s = self.budget_arg()
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+
+        def on_token(token: str):
+            # Llega desde el hilo del scheduler
+            loop.call_soon_threadsafe(tokens.put_nowait, token)
+
+        if budget_s is not None:
+            task = loop.run_in_executor(
+                _budget_executor,
+                lambda: answer_with_budget(question, k=k, model=model, filters=filters,
+                                           budget_s=budget_s, on_token=on_token,
+                                           started_at=arrived),
+            )
+        else:
+            hits = await retrieve_async(question, k=k, filters=filters)
+            prompt = build_prompt(question, build_contexts(hits))
+            # key=None: cada cliente necesita su propio stream de tokens
+            ticket = get_scheduler().submit(None, stream_generation, prompt, model, on_token)
+            task = asyncio.ensure_future(wait_ticket(ticket))
+        # Los tokens se encolan antes de que termine la tarea: el None va el último
+        task.add_done_callback(lambda _: tokens.put_nowait(None))
+
+        self.set_header("Content-Type", "application/x-ndjson")
+        streamed = False
+        while (token := await tokens.get()) is not None:
+            streamed = True
+            self.write(json.dumps({"token": token}) + "\n")
+            self.flush()
+        result = await task
+
+        if budget_s is None:
+            self.write(json.dumps({"done": True, "sources": _sources(hits)}) + "\n")
+            return
+        if not streamed and result["answer"]:
+            # Sin generación (fuentes solas o sin tiempo): la respuesta entera de una vez
+            self.write(json.dumps({"token": result["answer"]}) + "\n")
+        self.write(json.dumps({
+            "done": True, "sources": result["sources"],
+            "partial": result["partial"], "degradations": result["degradations"],
+        }) + "\n")
+
+
+async def _warm_embedder():
+    global _embedder_ready
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_executor, get_model)
+    _embedder_ready = True
+    print("[OK] Embedding model loaded.")
+
+
+def make_app() -> web.Application:
+    return web.Application([
+        (r"/health", HealthHandler),
+        (r"/ready", ReadyHandler),
+        (r"/stats", StatsHandler),
+        (r"/retrieve", RetrieveHandler),
+        (r"/answer", AnswerHandler),
+        (r"/answer/stream", StreamAnswerHandler),
+        (r"/models", ModelsHandler),
+        (r"/models/select", SelectModelHandler),
+    ])
+
+
+async def main(port: int = PORT):
+    app = make_app()
+    app.listen(port)
+    print(f"[INFO] RAG API listening on http://localhost:{port}")
+    await _warm_embedder()
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+# src/snapshot.py
+#
+# Snapshots portables del índice (chunks + artículos + embeddings) en Parquet,
+# para levantar un nodo nuevo sin descargar Wikipedia, sin el resumidor LLM
+# y sin volver a calcular embeddings.
+#
+#   python src/snapshot.py export                 # ES -> data/snapshots/<versión>/
+#   python src/snapshot.py import <dir-snapshot>  # <dir-snapshot> -> ES
+
+import argparse
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from elasticsearch import Elasticsearch, helpers
+from tqdm import tqdm
+
+from dedup import DEDUP_THRESHOLD
+from embedder import _MODEL_NAME, PROJECTION_PATH, load_projection
+from indexer import (
+    ARTICLE_INDEX_NAME, CHUNK_MAX_CHARS, CHUNK_OVERLAP, INDEX_NAME, NUMBER_OF_REPLICAS,
+    NUMBER_OF_SHARDS, build_version, get_es_client, get_meta, index_dims,
+)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_ROOT = Path("data/snapshots")
+BATCH_SIZE = 1000
+
+# Nombre de fichero de cada tabla -> alias ES de origen/destino
+TABLES = {
+    "chunks.parquet": INDEX_NAME,
+    "articles.parquet": ARTICLE_INDEX_NAME,
+}
+
+
+def snapshot_version() -> dict:
+    """
+    Todo lo que tiene que coincidir para que los embeddings guardados
+    sirvan tal cual en este nodo.
+    """
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "model_name": _MODEL_NAME,
+        "embedding_dims": index_dims(),
+        "chunk_max_chars": CHUNK_MAX_CHARS,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "dedup_threshold": DEDUP_THRESHOLD,
+    }
+
+
+def default_snapshot_dir() -> Path:
+    model_slug = re.sub(r"[^A-Za-z0-9.]+", "-", _MODEL_NAME).strip("-")
+    return SNAPSHOT_ROOT / f"{model_slug}-c{CHUNK_MAX_CHARS}-o{CHUNK_OVERLAP}"
+
+
+def _schema(dims: int) -> pa.Schema:
+    text = pa.string()
+    return pa.schema([
+        ("article_id", text),
+        ("topic", text),
+        ("summary", text),
+        ("key_points", text),
+        ("locations", pa.list_(text)),
+        ("people", pa.list_(text)),
+        ("date", text),
+        ("years_gte", pa.int32()),
+        ("years_lte", pa.int32()),
+        ("source", text),
+        ("url", text),
+        ("raw_text", text),
+        ("chunk_id", pa.int32()),
+        ("embedding", pa.list_(pa.float32(), dims)),
+    ])
+
+
+def _to_batch(docs: list[dict], schema: pa.Schema) -> pa.RecordBatch:
+    dims = schema.field("embedding").type.list_size
+    columns = {name: [] for name in schema.names if name != "embedding"}
+    for doc in docs:
+        years = doc.get("years") or {}
+        row = {**doc, "years_gte": years.get("gte"), "years_lte": years.get("lte")}
+        for name in columns:
+            columns[name].append(row.get(name))
+
+    vectors = np.asarray([d["embedding"] for d in docs], dtype=np.float32).reshape(-1)
+    arrays = [pa.array(columns[name], type=schema.field(name).type) for name in columns]
+    arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(vectors), dims))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_index(client: Elasticsearch, index_name: str, path: Path, version: dict) -> int:
+    schema = _schema(version["embedding_dims"]).with_metadata(
+        {"ww2_rag_snapshot": json.dumps(version)}
+    )
+    total = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        buffer = []
+        hits = helpers.scan(client, index=index_name, query={"query": {"match_all": {}}})
+        for hit in tqdm(hits, desc=f"Exporting {index_name}"):
+            buffer.append(hit["_source"])
+            if len(buffer) >= BATCH_SIZE:
+                writer.write_batch(_to_batch(buffer, schema))
+                total += len(buffer)
+                buffer = []
+        if buffer:
+            writer.write_batch(_to_batch(buffer, schema))
+            total += len(buffer)
+    return total
+
+
+def export_snapshot(out_dir: Path | None = None) -> Path:
+    client = get_es_client()
+    out_dir = out_dir or default_snapshot_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    version = snapshot_version()
+    counts = {}
+    for filename, index_name in TABLES.items():
+        counts[filename] = export_index(client, index_name, out_dir / filename, version)
+
+    # La proyección PCA del índice publicado (si la hay) viaja con los vectores reducidos
+    meta = get_meta(client, INDEX_NAME)
+    has_projection = bool(meta.get("projection"))
+    if has_projection:
+        load_projection(Path(meta["projection"]), meta.get("projection_sha1"))
+        shutil.copyfile(meta["projection"], out_dir / PROJECTION_PATH.name)
+
+    manifest = {**version, "counts": counts, "projection": has_projection}
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    print(f"[OK] Snapshot written to {out_dir} ({counts})")
+    return out_dir
+
+
+def check_compatible(manifest: dict):
+    expected = snapshot_version()
+    mismatches = {
+        key: (manifest.get(key), value)
+        for key, value in expected.items()
+        if manifest.get(key) != value
+    }
+    if mismatches:
+        details = ", ".join(f"{k}: snapshot={a!r} node={b!r}" for k, (a, b) in mismatches.items())
+        raise ValueError(f"Snapshot is not compatible with this node ({details})")
+
+
+def iter_snapshot_docs(path: Path) -> Iterable[dict]:
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=BATCH_SIZE):
+        embeddings = batch.column("embedding")
+        dims = embeddings.type.list_size
+        vectors = embeddings.flatten().to_numpy(zero_copy_only=False).reshape(-1, dims)
+        rows = batch.drop_columns(["embedding"]).to_pylist()
+        for row, vec in zip(rows, vectors):
+            gte, lte = row.pop("years_gte"), row.pop("years_lte")
+            row["years"] = {"gte": gte, "lte": lte} if gte is not None else None
+            if row.get("chunk_id") is None:
+                row.pop("chunk_id", None)
+                row.pop("raw_text", None)
+            row["embedding"] = vec.tolist()
+            yield row
+
+
+def import_snapshot(snapshot_dir: Path, force: bool = False,
+                    shards: int = NUMBER_OF_SHARDS, replicas: int = NUMBER_OF_REPLICAS):
+    manifest = json.loads((snapshot_dir / "manifest.json").read_text(encoding="utf-8"))
+    if not force:
+        check_compatible(manifest)
+
+    projection = None
+    if manifest.get("projection"):
+        projection = load_projection(snapshot_dir / PROJECTION_PATH.name)
+
+    # Se carga en una versión nueva; la actual sigue sirviendo hasta el cambio de alias
+    client = get_es_client()
+
+    def load(indices: dict[str, str]):
+        for filename, alias in TABLES.items():
+            path = snapshot_dir / filename
+            index_name = indices[alias]
+            expected = manifest["counts"][filename]
+            actions = (
+                {"_index": index_name, "_source": doc}
+                for doc in tqdm(iter_snapshot_docs(path), total=expected, desc=f"Loading {index_name}")
+            )
+            ok, errors = helpers.bulk(client, actions, chunk_size=500, raise_on_error=False)
+            n_errors = len(errors) if isinstance(errors, list) else errors
+            print(f"[OK] {index_name}: {ok} docs loaded, {n_errors} errors")
+            if n_errors or ok != expected:
+                # Una carga parcial nunca se publica
+                raise ValueError(f"{index_name}: loaded {ok}/{expected} docs with {n_errors} errors; import aborted")
+
+    build_version(client, load, shards, replicas, projection)
+
+    print("[OK] Snapshot import completed (no embeddings computed).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export/import Parquet index snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Dump the ES indices to a snapshot directory")
+    p_export.add_argument("--out", type=Path, default=None)
+
+    p_import = sub.add_parser("import", help="Bulk-load a snapshot into ES")
+    p_import.add_argument("snapshot_dir", type=Path)
+    p_import.add_argument("--force", action="store_true",
+                          help="Load even if model/chunker settings differ")
+    p_import.add_argument("--shards", type=int, default=NUMBER_OF_SHARDS)
+    p_import.add_argument("--replicas", type=int, default=NUMBER_OF_REPLICAS)
+
+    args = parser.parse_args()
+    try:
+        if args.command == "export":
+            export_snapshot(args.out)
+        else:
+            import_snapshot(args.snapshot_dir, force=args.force,
+                            shards=args.shards, replicas=args.replicas)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
@@ -1,3 +1,7 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
 def wrap_letters(text):
     html = ""
     for char in text:
@@ -7,4 +11,24 @@ def wrap_letters(text):
             f'<span class="letter bottom">{char}</span>'
             f'</span>'
         )
-    return html
\ No newline at end of file
+    return html
+
+STATIC_DIR = Path("static")
+# Con server.enableStaticServing, Streamlit sirve ./static en /app/static
+STATIC_URL_PREFIX = "app/static"
+
+@lru_cache(maxsize=None)
+def static_url(rel_path: str) -> str:
+    """
+    URL servida por Streamlit para un fichero de static/, con hash de contenido
+    para que el navegador lo cachee y solo lo vuelva a pedir si cambia.
+    """
+    digest = hashlib.sha1((STATIC_DIR / rel_path).read_bytes()).hexdigest()[:12]
+    return f"{STATIC_URL_PREFIX}/{rel_path}?v={digest}"
+
+@lru_cache(maxsize=None)
+def load_static_bytes(rel_path: str) -> bytes:
+    """
+    Lee una vez un asset (p.ej. avatares) y lo mantiene en memoria entre reruns.
+    """
+    return (STATIC_DIR / rel_path).read_bytes()